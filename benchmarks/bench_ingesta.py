@@ -0,0 +1,41 @@
+# Compara la lectura completa (pd.read_excel) contra la lectura en streaming con proyección de columnas.
+# Uso: python benchmarks/bench_ingesta.py archivo.xlsx [hoja]
+import io
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+from procesamiento import _leer_hoja_streaming, _normalizar_base
+
+def _medir(funcion):
+    # El tiempo se mide sin tracemalloc, que ralentiza mucho el parseo; la memoria en una segunda pasada
+    inicio = time.perf_counter()
+    df = funcion()
+    segundos = time.perf_counter() - inicio
+    tracemalloc.start()
+    funcion()
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return df, segundos, pico
+
+def comparar(ruta, sheet_name='BaseQuery'):
+    with open(ruta, 'rb') as f: contenido = f.read()
+    modos = {
+        'completo': lambda: _normalizar_base(pd.read_excel(io.BytesIO(contenido), sheet_name=sheet_name, engine='openpyxl')),
+        'streaming': lambda: _normalizar_base(_leer_hoja_streaming(contenido, sheet_name)),
+    }
+    resultados = {}
+    for modo, funcion in modos.items():
+        df, segundos, pico = _medir(funcion)
+        resultados[modo] = {'filas': len(df), 'columnas': df.shape[1], 'segundos': segundos, 'pico_mb': pico / 2**20, 'df_mb': df.memory_usage(deep=True).sum() / 2**20}
+    return resultados
+
+if __name__ == '__main__':
+    resultados = comparar(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else 'BaseQuery')
+    print(f"{'modo':<10} {'filas':>8} {'cols':>5} {'seg':>8} {'pico MB':>9} {'frame MB':>9}")
+    for modo, r in resultados.items():
+        print(f"{modo:<10} {r['filas']:>8} {r['columnas']:>5} {r['segundos']:>8.2f} {r['pico_mb']:>9.1f} {r['df_mb']:>9.1f}")
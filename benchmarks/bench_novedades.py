@@ -0,0 +1,129 @@
+# Compara el pipeline de novedades actual (máscaras, sin copias, fechas formateadas al dibujar) contra la versión
+# anterior (copias completas y strftime fila por fila): verifica que los resultados y los PDF sean idénticos y mide
+# tiempo y pico de memoria de filtrar + calcular activos + formatear para varios períodos.
+# Uso: python benchmarks/bench_novedades.py [filas ...]
+import os
+import re
+import sys
+import time
+import tracemalloc
+import warnings
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+from generar_workbook import generar_base
+from procesamiento import (COLUMNAS_CATEGORICAS, _formatear_fechas, _normalizar_base, calcular_activos_a_fecha, contar_bajas_por_motivo, crear_pdf_reporte,
+                           filtrar_novedades_por_fecha, formatear_y_procesar_novedades)
+
+warnings.simplefilter('ignore', DeprecationWarning)
+
+# --- Versión anterior, como referencia ---
+def _formatear_anterior(df_altas_raw, df_bajas_raw):
+    df_bajas = df_bajas_raw.copy()
+    if not df_bajas.empty:
+        df_bajas['Antigüedad'] = ((datetime.now() - df_bajas['Fecha']) / pd.Timedelta(days=365.25)).fillna(0).astype(int)
+        df_bajas['Fecha nac.'] = df_bajas['Fecha nac.'].dt.strftime('%d/%m/%Y')
+        df_bajas['Desde'] = df_bajas['Desde'].dt.strftime('%d/%m/%Y')
+    else:
+        df_bajas = pd.DataFrame(columns=['Nº pers.', 'Apellido', 'Nombre de pila', 'Motivo de la medida', 'Fecha nac.', 'Antigüedad', 'Desde', 'Línea', 'Categoría'])
+    df_altas = df_altas_raw.copy()
+    if not df_altas.empty:
+        df_altas['Fecha'] = df_altas['Fecha'].dt.strftime('%d/%m/%Y')
+        df_altas['Fecha nac.'] = df_altas['Fecha nac.'].dt.strftime('%d/%m/%Y')
+    else:
+        df_altas = pd.DataFrame(columns=['Nº pers.', 'Apellido', 'Nombre de pila', 'Fecha nac.', 'Fecha', 'Línea', 'Categoría'])
+    return df_altas, df_bajas
+
+def _filtrar_anterior(df_base_para_filtrar, fecha_inicio, fecha_fin):
+    df = df_base_para_filtrar.copy()
+    altas_filtradas = df[(df['Fecha'] >= fecha_inicio) & (df['Fecha'] <= fecha_fin)].copy()
+    df_bajas_potenciales = df[df['Status ocupación'] == 'Dado de baja'].copy()
+    if not df_bajas_potenciales.empty:
+        df_bajas_potenciales['fecha_baja_corregida'] = df_bajas_potenciales['Desde'] - pd.Timedelta(days=1)
+        bajas_filtradas = df_bajas_potenciales[(df_bajas_potenciales['fecha_baja_corregida'] >= fecha_inicio) & (df_bajas_potenciales['fecha_baja_corregida'] <= fecha_fin)].copy()
+        if not bajas_filtradas.empty:
+            bajas_filtradas['Desde'] = bajas_filtradas['fecha_baja_corregida']
+    else:
+        bajas_filtradas = pd.DataFrame()
+    return altas_filtradas, bajas_filtradas
+
+def _activos_anterior(df_base, fecha_fin):
+    df = df_base.copy()
+    df = df[df['Fecha'] <= fecha_fin]
+    df_bajas = df[df['Status ocupación'] == 'Dado de baja'].copy()
+    if not df_bajas.empty:
+        df_bajas['fecha_baja_corregida'] = df_bajas['Desde'] - pd.Timedelta(days=1)
+        legajos_baja_despues_de_fecha = df_bajas[df_bajas['fecha_baja_corregida'] > fecha_fin]['Nº pers.']
+    else:
+        legajos_baja_despues_de_fecha = []
+    return df[(df['Status ocupación'] == 'Activo') | (df['Nº pers.'].isin(legajos_baja_despues_de_fecha))]
+
+def base_sintetica(filas, semilla=0):
+    # Mismos tipos que deja procesar_archivo_base, con algunos legajos repetidos y fechas faltantes
+    rng = np.random.default_rng(semilla)
+    df = generar_base(filas, semilla)
+    df['Nº pers.'] = df['Nº pers.'].astype('int32')
+    repetidos = rng.random(filas) < 0.01
+    df.loc[repetidos, 'Nº pers.'] = df['Nº pers.'].sample(int(repetidos.sum()), random_state=semilla).to_numpy()
+    for col in ['Desde', 'Fecha nac.']: df.loc[rng.random(filas) < 0.005, col] = pd.NaT
+    for col in COLUMNAS_CATEGORICAS: df[col] = pd.Categorical(df[col])
+    return _normalizar_base(df[['Nº pers.', 'Apellido', 'Nombre de pila', 'Fecha', 'Desde', 'Fecha nac.', 'Status ocupación', 'Motivo de la medida', 'Gr.prof.', 'División de personal']])
+
+def _a_texto(df, columnas):
+    # Formato de pantalla/PDF de la versión actual, para compararla con los strings de la anterior
+    return df.assign(**{col: _formatear_fechas(df[col]) for col in columnas if pd.api.types.is_datetime64_any_dtype(df[col])})
+
+def _sin_fecha_creacion(pdf_bytes):
+    # La fecha de creación y el /ID (que se deriva de ella) cambian entre dos llamadas aunque el contenido sea el mismo
+    return re.sub(rb'/ID \[<[0-9A-F]*><[0-9A-F]*>\]', b'', re.sub(rb'/CreationDate \(D:[^)]*\)', b'', pdf_bytes))
+
+def _pipeline(filtrar, activos, formatear, df_base, inicio, fin):
+    altas_raw, bajas_raw = filtrar(df_base, inicio, fin)
+    df_activos = activos(df_base, fin)
+    return formatear(altas_raw, bajas_raw), (altas_raw, bajas_raw), df_activos
+
+def verificar(df_base, inicio, fin):
+    (altas, bajas), (altas_raw, bajas_raw), df_activos = _pipeline(filtrar_novedades_por_fecha, calcular_activos_a_fecha, formatear_y_procesar_novedades, df_base, inicio, fin)
+    (altas_ant, bajas_ant), (altas_raw_ant, bajas_raw_ant), df_activos_ant = _pipeline(_filtrar_anterior, _activos_anterior, _formatear_anterior, df_base, inicio, fin)
+    pd.testing.assert_frame_equal(altas_raw, altas_raw_ant)
+    pd.testing.assert_frame_equal(bajas_raw, bajas_raw_ant)
+    pd.testing.assert_frame_equal(df_activos, df_activos_ant)
+    pd.testing.assert_frame_equal(_a_texto(altas, ['Fecha', 'Fecha nac.']), altas_ant, check_dtype=False)  # strftime devuelve dtype str
+    pd.testing.assert_frame_equal(_a_texto(bajas, ['Fecha nac.', 'Desde']), bajas_ant, check_dtype=False)
+
+    resumen = lambda df: pd.crosstab(df['Categoría'], df['Línea'], margins=True, margins_name="Total")
+    rango = f"{inicio.strftime('%d/%m/%Y')} - {fin.strftime('%d/%m/%Y')}"
+    pdf = lambda a, b: _sin_fecha_creacion(crear_pdf_reporte("Resumen Mensual de Dotación", rango, a, b, contar_bajas_por_motivo(bajas_raw).reset_index(), resumen(altas_raw), resumen(bajas_raw), resumen(df_activos)))
+    return pdf(altas, bajas) == pdf(altas_ant, bajas_ant)
+
+def medir(funcion):
+    inicio = time.perf_counter()
+    funcion()
+    segundos = time.perf_counter() - inicio
+    tracemalloc.start()
+    funcion()
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return segundos, pico / 2**20
+
+if __name__ == '__main__':
+    tamanos = [int(n) for n in sys.argv[1:]] or [10_000, 100_000]
+    for n in tamanos:
+        df_base = base_sintetica(n)
+        print(f"\n== {n} filas (base: {df_base.memory_usage(deep=True).sum() / 2**20:.1f} MB) ==")
+        print(f"{'período':<24} {'idéntico':>9} {'PDF idéntico':>13} {'seg antes':>10} {'seg ahora':>10} {'MB antes':>9} {'MB ahora':>9}")
+        fin_datos = df_base['Fecha'].max().normalize()
+        periodos = {
+            'semana': (fin_datos - pd.Timedelta(days=6), fin_datos),
+            'mes': (fin_datos.replace(day=1) - pd.offsets.MonthBegin(1), fin_datos.replace(day=1) - pd.Timedelta(days=1)),
+            'año': (fin_datos - pd.Timedelta(days=364), fin_datos),
+        }
+        for nombre, (inicio, fin) in periodos.items():
+            pdf_identico = verificar(df_base, inicio, fin) if nombre != 'año' or n <= 10_000 else None
+            seg_ant, mb_ant = medir(lambda: _pipeline(_filtrar_anterior, _activos_anterior, _formatear_anterior, df_base, inicio, fin))
+            seg, mb = medir(lambda: _pipeline(filtrar_novedades_por_fecha, calcular_activos_a_fecha, formatear_y_procesar_novedades, df_base, inicio, fin))
+            etiqueta = f"{nombre} {inicio.strftime('%d/%m/%y')}-{fin.strftime('%d/%m/%y')}"
+            print(f"{etiqueta:<24} {'sí':>9} {('sí' if pdf_identico else 'NO') if pdf_identico is not None else '-':>13} {seg_ant:>10.4f} {seg:>10.4f} {mb_ant:>9.1f} {mb:>9.1f}")
@@ -0,0 +1,174 @@
+# Mide tiempo y pico de memoria de cada etapa del pipeline sobre workbooks sintéticos de 10k, 100k y 1M filas
+# (ver generar_workbook.py) y guarda los resultados en JSON para comparar entre commits. --comparar solo acepta
+# corridas sobre los mismos datos: misma semilla, fecha de referencia y cantidad de filas.
+# Uso: python benchmarks/bench_pipeline.py [--filas 10000 100000 1000000] [--semilla 0] [--hoy 2025-06-30] [--repeticiones 3] [--sin-memoria] [--salida archivo.json]
+#      python benchmarks/bench_pipeline.py --comparar antes.json despues.json
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+import procesamiento
+from generar_workbook import FECHA_REFERENCIA, obtener_workbook
+from procesamiento import (CuboDotacion, calcular_activos_a_fecha, contar_bajas_por_motivo, crear_pdf_reporte, filtrar_novedades_por_fecha,
+                           formatear_y_procesar_novedades, procesar_archivo_base)
+
+warnings.simplefilter('ignore', DeprecationWarning)
+
+RESULTADOS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'resultados')
+FILAS_POR_DEFECTO = [10_000, 100_000, 1_000_000]
+
+def _filas(resultado):
+    if isinstance(resultado, (pd.DataFrame, pd.Series)): return len(resultado)
+    if isinstance(resultado, tuple): return sum(_filas(r) for r in resultado)
+    if isinstance(resultado, (bytes, bytearray)): return len(resultado)
+    return None
+
+def _medir(funcion, repeticiones, memoria):
+    # El tiempo (mejor de N) se mide sin tracemalloc, que ralentiza mucho; la memoria en una pasada aparte
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    medicion = {'segundos': min(tiempos), 'segundos_mediana': sorted(tiempos)[len(tiempos) // 2], 'filas': _filas(resultado)}
+    if memoria:
+        tracemalloc.start()
+        funcion()
+        _, pico = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        medicion['pico_mb'] = pico / 2**20
+    return resultado, medicion
+
+def _periodo(df_base):
+    # Último mes completo de los datos: el caso típico del reporte mensual
+    fin = df_base['Fecha'].max().normalize().replace(day=1) - pd.Timedelta(days=1)
+    return fin.replace(day=1), fin
+
+def medir_pipeline(ruta, repeticiones=3, memoria=True):
+    etapas = {}
+    cache_original = procesamiento.CACHE_DIR
+    with tempfile.TemporaryDirectory() as cache:
+        # Cada lectura "sin caché" usa un directorio nuevo para que no encuentre el parquet de la pasada anterior
+        contador = iter(range(10**6))
+        def leer_sin_cache():
+            procesamiento.CACHE_DIR = os.path.join(cache, str(next(contador)))
+            return procesar_archivo_base(ruta)
+        try:
+            df_base, etapas['procesar_archivo_base'] = _medir(leer_sin_cache, 1, memoria)
+            procesamiento.CACHE_DIR = os.path.join(cache, 'caliente')
+            procesar_archivo_base(ruta)
+            _, etapas['procesar_archivo_base (caché)'] = _medir(lambda: procesar_archivo_base(ruta), repeticiones, memoria)
+        finally:
+            procesamiento.CACHE_DIR = cache_original
+
+    inicio, fin = _periodo(df_base)
+    rango = f"{inicio.strftime('%d/%m/%Y')} - {fin.strftime('%d/%m/%Y')}"
+    (df_altas_raw, df_bajas_raw), etapas['filtrar_novedades_por_fecha'] = _medir(lambda: filtrar_novedades_por_fecha(df_base, inicio, fin), repeticiones, memoria)
+    df_activos, etapas['calcular_activos_a_fecha'] = _medir(lambda: calcular_activos_a_fecha(df_base, fin), repeticiones, memoria)
+    (df_altas, df_bajas), etapas['formatear_y_procesar_novedades'] = _medir(lambda: formatear_y_procesar_novedades(df_altas_raw, df_bajas_raw), repeticiones, memoria)
+
+    def crosstabs():
+        resumen = lambda df: pd.crosstab(df['Categoría'], df['Línea'], margins=True, margins_name="Total")
+        return resumen(df_altas_raw), resumen(df_bajas_raw), resumen(df_activos), contar_bajas_por_motivo(df_bajas_raw)
+    (resumen_altas, resumen_bajas, resumen_activos, bajas_motivo), etapas['crosstabs'] = _medir(crosstabs, repeticiones, memoria)
+
+    cubo, etapas['CuboDotacion (armado)'] = _medir(lambda: CuboDotacion(df_base), repeticiones, memoria)
+    def consultas_cubo():
+        return cubo.resumen_altas(inicio, fin), cubo.resumen_bajas(inicio, fin), cubo.resumen_activos(fin), cubo.bajas_por_motivo(inicio, fin)
+    _, etapas['CuboDotacion (consultas)'] = _medir(consultas_cubo, repeticiones, memoria)
+
+    tablas = (df_altas, df_bajas, bajas_motivo.reset_index(), resumen_altas, resumen_bajas, resumen_activos)
+    _, etapas['crear_pdf_reporte'] = _medir(lambda: crear_pdf_reporte("Resumen Mensual de Dotación", rango, *tablas), repeticiones, memoria)
+    return {'filas_base': len(df_base), 'periodo': [inicio.strftime('%Y-%m-%d'), fin.strftime('%Y-%m-%d')], 'etapas': etapas}
+
+def _commit():
+    try:
+        raiz = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=raiz, capture_output=True, text=True, check=True).stdout.strip()
+        sucio = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=raiz, capture_output=True, text=True).stdout.strip()
+        return commit + ('-dirty' if sucio else '')
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def ejecutar(filas, semilla=0, repeticiones=3, memoria=True, hoy=FECHA_REFERENCIA):
+    import fpdf, numpy, openpyxl
+    hoy = pd.Timestamp(hoy).normalize()
+    resultado = {
+        'commit': _commit(), 'fecha': datetime.now().isoformat(timespec='seconds'), 'semilla': semilla, 'fecha_referencia': hoy.strftime('%Y-%m-%d'), 'repeticiones': repeticiones,
+        'entorno': {'python': platform.python_version(), 'pandas': pd.__version__, 'numpy': numpy.__version__, 'openpyxl': openpyxl.__version__, 'fpdf2': fpdf.__version__, 'maquina': platform.machine(), 'cpus': os.cpu_count()},
+        'tamanos': {},
+    }
+    for n in filas:
+        inicio = time.perf_counter()
+        ruta = obtener_workbook(n, semilla, hoy=hoy)
+        print(f"{n} filas: workbook listo en {time.perf_counter() - inicio:.1f} s ({os.path.getsize(ruta) / 2**20:.1f} MB)", file=sys.stderr)
+        resultado['tamanos'][str(n)] = medir_pipeline(ruta, repeticiones, memoria)
+        imprimir(n, resultado['tamanos'][str(n)])
+    return resultado
+
+def imprimir(n, medicion):
+    print(f"\n== {n} filas (período {medicion['periodo'][0]} - {medicion['periodo'][1]}) ==")
+    print(f"{'etapa':<34} {'seg':>9} {'pico MB':>9} {'filas':>9}")
+    for etapa, m in medicion['etapas'].items():
+        pico = f"{m['pico_mb']:>9.1f}" if 'pico_mb' in m else f"{'-':>9}"
+        print(f"{etapa:<34} {m['segundos']:>9.4f} {pico} {m['filas'] if m['filas'] is not None else '-':>9}")
+
+def _diferencias_de_datos(antes, despues):
+    # Motivos por los que dos corridas no midieron los mismos datos (vacío si son comparables)
+    motivos = [f"{campo}: {antes.get(campo)} vs. {despues.get(campo)}" for campo in ('semilla', 'fecha_referencia') if antes.get(campo) is None or antes.get(campo) != despues.get(campo)]
+    if not set(antes['tamanos']) & set(despues['tamanos']): motivos.append(f"filas: {', '.join(antes['tamanos'])} vs. {', '.join(despues['tamanos'])}")
+    for n in set(antes['tamanos']) & set(despues['tamanos']):
+        a, d = antes['tamanos'][n], despues['tamanos'][n]
+        if a['filas_base'] != d['filas_base'] or a['periodo'] != d['periodo']: motivos.append(f"{n} filas: base {a['filas_base']}, período {a['periodo']} vs. base {d['filas_base']}, período {d['periodo']}")
+    return motivos
+
+def comparar(ruta_antes, ruta_despues):
+    with open(ruta_antes, encoding='utf-8') as f: antes = json.load(f)
+    with open(ruta_despues, encoding='utf-8') as f: despues = json.load(f)
+    motivos = _diferencias_de_datos(antes, despues)
+    if motivos:
+        print("Las corridas no usaron los mismos datos:\n  " + "\n  ".join(motivos), file=sys.stderr)
+        return False
+    print(f"{antes['commit']} -> {despues['commit']} (semilla {despues['semilla']}, datos al {despues['fecha_referencia']})")
+    for n, medicion in despues['tamanos'].items():
+        if n not in antes['tamanos']: continue
+        print(f"\n== {n} filas ==")
+        print(f"{'etapa':<34} {'seg antes':>10} {'seg ahora':>10} {'x':>7} {'MB antes':>9} {'MB ahora':>9}")
+        for etapa, m in medicion['etapas'].items():
+            a = antes['tamanos'][n]['etapas'].get(etapa)
+            if a is None: continue
+            factor = a['segundos'] / m['segundos'] if m['segundos'] else float('inf')
+            mb = lambda r: f"{r['pico_mb']:>9.1f}" if 'pico_mb' in r else f"{'-':>9}"
+            print(f"{etapa:<34} {a['segundos']:>10.4f} {m['segundos']:>10.4f} {factor:>6.2f}x {mb(a)} {mb(m)}")
+    return True
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark por etapa del pipeline de dotación.")
+    parser.add_argument('--filas', type=int, nargs='+', default=FILAS_POR_DEFECTO)
+    parser.add_argument('--semilla', type=int, default=0)
+    parser.add_argument('--hoy', default=FECHA_REFERENCIA, help="Fecha de referencia de los datos sintéticos (por defecto, %(default)s)")
+    parser.add_argument('--repeticiones', type=int, default=3)
+    parser.add_argument('--sin-memoria', action='store_true', help="No mide el pico de memoria (evita la pasada extra con tracemalloc)")
+    parser.add_argument('--salida', default=None, help="Archivo JSON de resultados (por defecto, benchmarks/resultados/<commit>_<fecha>.json)")
+    parser.add_argument('--comparar', nargs=2, metavar=('ANTES', 'DESPUES'), help="Compara dos archivos de resultados y termina")
+    args = parser.parse_args()
+
+    if args.comparar:
+        sys.exit(0 if comparar(*args.comparar) else 1)
+
+    resultado = ejecutar(args.filas, args.semilla, args.repeticiones, not args.sin_memoria, args.hoy)
+    salida = args.salida or os.path.join(RESULTADOS_DIR, f"{resultado['commit'] or 'sin-commit'}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(salida)), exist_ok=True)
+    with open(salida, 'w', encoding='utf-8') as f: json.dump(resultado, f, ensure_ascii=False, indent=2)
+    print(f"\nResultados en {salida}")
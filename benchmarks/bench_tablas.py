@@ -0,0 +1,47 @@
+# Mide filas/segundo de PDF.draw_table sobre una tabla "Detalle de Bajas" sintética de 1k, 10k y 50k filas,
+# con la emisión en bloque y con la emisión celda por celda (cell()).
+# Uso: python benchmarks/bench_tablas.py [filas ...]
+import os
+import sys
+import time
+import warnings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+from procesamiento import PDF
+
+warnings.simplefilter('ignore', DeprecationWarning)
+
+def detalle_bajas(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'Nº pers.': rng.integers(10_000_000, 99_999_999, n).astype('int32'),
+        'Apellido': [f"APELLIDO{i}" for i in rng.integers(0, 5000, n)],
+        'Nombre de pila': [f"Nombre{i}" for i in rng.integers(0, 2000, n)],
+        'Motivo de la medida': pd.Categorical(rng.choice(['Renuncia', 'Jubilación', 'Despido', 'Fallecimiento'], n)),
+        'Fecha nac.': (pd.Timestamp('1960-01-01') + pd.to_timedelta(rng.integers(0, 15000, n), 'D')).strftime('%d/%m/%Y'),
+        'Antigüedad': rng.integers(0, 40, n),
+        'Desde': (pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 365, n), 'D')).strftime('%d/%m/%Y'),
+        'Línea': pd.Categorical(rng.choice(['ROCA', 'MITRE', 'SARMIENTO', 'SAN MARTIN', 'BELGRANO SUR', 'REGIONALES', 'CENTRAL'], n)),
+        'Categoría': pd.Categorical(rng.choice(['COOR.E.T', 'INST.TEC', 'INS.CERT', 'CON.ELEC', 'CON.DIES', 'AY.CON.H', 'AY.CONDU', 'ASP.AY.C'], n)),
+    })
+
+def medir(df, en_bloque):
+    pdf = PDF(orientation='L', unit='mm', format='A4')
+    pdf.emision_en_bloque = en_bloque
+    pdf.add_page()
+    inicio = time.perf_counter()
+    pdf.draw_table("Detalle de Bajas", df)
+    segundos = time.perf_counter() - inicio
+    return segundos, b"".join(bytes(pagina.contents) for pagina in pdf.pages.values())
+
+if __name__ == '__main__':
+    tamanos = [int(n) for n in sys.argv[1:]] or [1_000, 10_000, 50_000]
+    print(f"{'filas':>8} {'por celda (f/s)':>16} {'en bloque (f/s)':>16} {'mejora':>7}  idéntico")
+    for n in tamanos:
+        df = detalle_bajas(n)
+        seg_celda, pdf_celda = medir(df, False)
+        seg_bloque, pdf_bloque = medir(df, True)
+        print(f"{n:>8} {n / seg_celda:>16,.0f} {n / seg_bloque:>16,.0f} {seg_celda / seg_bloque:>6.1f}x  {pdf_celda == pdf_bloque}")
@@ -0,0 +1,115 @@
+# Generador determinístico (con semilla) de workbooks sintéticos con el formato del export real:
+# pestañas 'BaseQuery' y 'Sheet1' (mismo layout) y 'Activos' (legajos activos de la carga anterior).
+# Las fechas se generan hacia atrás desde una fecha de referencia fija (FECHA_REFERENCIA, no la fecha del día):
+# la misma semilla da los mismos datos en cualquier corrida.
+# Uso: python benchmarks/generar_workbook.py filas [--semilla 0] [--hoy 2025-06-30] [--salida archivo.xlsx] [--sin-sheet1]
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+from procesamiento import ORDEN_CATEGORIAS, ORDEN_LINEAS
+
+DATOS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'datos')
+FECHA_REFERENCIA = '2025-06-30'
+
+# Proporciones aproximadas de la dotación real: más personal en las líneas grandes y en las categorías de conducción
+PESOS_LINEAS = [0.24, 0.18, 0.16, 0.14, 0.08, 0.12, 0.08]
+PESOS_CATEGORIAS = [0.03, 0.05, 0.07, 0.22, 0.15, 0.10, 0.28, 0.10]
+MOTIVOS_BAJA = ['Renuncia', 'Jubilación', 'Despido', 'Fin de contrato', 'Fallecimiento', 'Incapacidad']
+PESOS_MOTIVOS_BAJA = [0.38, 0.30, 0.12, 0.12, 0.04, 0.04]
+MOTIVOS_ALTA = ['Ingreso', 'Reingreso', 'Traslado']
+PESOS_MOTIVOS_ALTA = [0.85, 0.05, 0.10]
+PROPORCION_BAJAS = 0.18
+# Filas que se convierten a valores Python por vez al escribir el workbook
+FILAS_POR_TRAMO = 10_000
+# Columnas que trae el export y la app no usa: agregan ancho como en el archivo real
+COLUMNAS_EXTRA = ['Sociedad', 'Área de personal', 'Subdivisión de personal', 'Posición', 'Centro de coste', 'Relación laboral', 'Clave de convenio', 'Horario']
+ENCABEZADO = ['Nº pers.', 'Apellido', 'Nombre de pila', 'Fecha', 'Desde', 'Fecha nac.', 'Status ocupación', 'Motivo de la medida', 'Gr.prof.', 'División de personal'] + COLUMNAS_EXTRA
+
+APELLIDOS = ['GONZALEZ', 'RODRIGUEZ', 'GOMEZ', 'FERNANDEZ', 'LOPEZ', 'DIAZ', 'MARTINEZ', 'PEREZ', 'GARCIA', 'SANCHEZ', 'ROMERO', 'SOSA', 'TORRES', 'ALVAREZ', 'RUIZ', 'RAMIREZ', 'FLORES', 'BENITEZ', 'ACOSTA', 'MEDINA', 'HERRERA', 'SUAREZ', 'AGUIRRE', 'GIMENEZ', 'PEREYRA', 'GUTIERREZ', 'MOLINA', 'CASTRO', 'ROJAS', 'ORTIZ', 'NUÑEZ', 'LUNA']
+NOMBRES = ['Juan', 'Carlos', 'Jorge', 'Luis', 'Miguel', 'José', 'Daniel', 'Marcelo', 'Sergio', 'Pablo', 'Diego', 'Martín', 'María', 'Laura', 'Silvia', 'Andrea', 'Claudia', 'Gabriela', 'Florencia', 'Lucía', 'Sofía', 'Valeria']
+
+def generar_base(filas, semilla=0, hoy=None):
+    rng = np.random.default_rng(semilla)
+    hoy = pd.Timestamp(hoy or FECHA_REFERENCIA).normalize()
+
+    # Altas concentradas en los últimos años (antigüedad ~ exponencial, hasta 40 años)
+    antiguedad_dias = np.minimum(rng.exponential(9 * 365, filas), 40 * 365).astype(np.int64)
+    fecha = hoy - pd.to_timedelta(antiguedad_dias, 'D')
+    es_baja = rng.random(filas) < PROPORCION_BAJAS
+    # La baja ocurre en algún momento entre el alta y hoy; 'Desde' es el día siguiente al último día trabajado
+    dias_hasta_baja = (rng.random(filas) * (antiguedad_dias + 1)).astype(np.int64)
+    desde = np.where(es_baja, (fecha + pd.to_timedelta(dias_hasta_baja + 1, 'D')).to_numpy(), fecha.to_numpy())
+    edad_ingreso_dias = rng.integers(19 * 365, 50 * 365, filas)
+    fecha_nac = fecha - pd.to_timedelta(edad_ingreso_dias, 'D')
+
+    return pd.DataFrame({
+        'Nº pers.': rng.permutation(np.arange(10_000_000, 10_000_000 + filas)),
+        'Apellido': rng.choice(APELLIDOS, filas),
+        'Nombre de pila': rng.choice(NOMBRES, filas),
+        'Fecha': fecha,
+        'Desde': pd.to_datetime(desde),
+        'Fecha nac.': fecha_nac,
+        'Status ocupación': np.where(es_baja, 'Dado de baja', 'Activo'),
+        'Motivo de la medida': np.where(es_baja, rng.choice(MOTIVOS_BAJA, filas, p=PESOS_MOTIVOS_BAJA), rng.choice(MOTIVOS_ALTA, filas, p=PESOS_MOTIVOS_ALTA)),
+        'Gr.prof.': rng.choice(ORDEN_CATEGORIAS, filas, p=PESOS_CATEGORIAS),
+        'División de personal': rng.choice(ORDEN_LINEAS, filas, p=PESOS_LINEAS),
+        **{col: rng.integers(1000, 9999, filas).astype(str) for col in COLUMNAS_EXTRA},
+    })
+
+def legajos_activos_anteriores(df, semilla=0, dias=30, hoy=None):
+    # 'Activos' de la carga anterior: quienes estaban activos hace `dias` días (incluye las bajas recientes y no las altas recientes)
+    rng = np.random.default_rng(semilla + 1)
+    corte = pd.Timestamp(hoy or FECHA_REFERENCIA).normalize() - pd.Timedelta(days=dias)
+    activos = (df['Fecha'] <= corte) & ((df['Status ocupación'] == 'Activo') | (df['Desde'] > corte))
+    # Algunos legajos del archivo viejo ya no aparecen o cambiaron de número
+    return df.loc[activos & (rng.random(len(df)) > 0.002), ['Nº pers.']]
+
+def _filas_excel(df):
+    # Filas de un tramo de la base como tuplas de valores Python (las fechas como datetime, que openpyxl escribe como fecha)
+    columnas = [df[col].dt.to_pydatetime() if col in ('Fecha', 'Desde', 'Fecha nac.') else df[col].tolist() for col in ENCABEZADO]
+    return zip(*columnas)
+
+def escribir_workbook(df_base, df_activos, ruta, con_sheet1=True, filas_por_tramo=FILAS_POR_TRAMO):
+    # Se convierte y escribe de a tramos, en todas las hojas a la vez: las tuplas de Python de un tramo se liberan antes
+    # del siguiente, así la memoria del armado no crece con la cantidad de filas (write_only ya vuelca cada hoja a disco)
+    wb = Workbook(write_only=True)
+    hojas = [wb.create_sheet(hoja) for hoja in ['BaseQuery'] + (['Sheet1'] if con_sheet1 else [])]
+    for ws in hojas: ws.append(ENCABEZADO)
+    for inicio in range(0, len(df_base), filas_por_tramo):
+        for fila in _filas_excel(df_base.iloc[inicio:inicio + filas_por_tramo]):
+            for ws in hojas: ws.append(fila)
+    ws = wb.create_sheet('Activos')
+    ws.append(['Nº pers.'])
+    for legajo in df_activos['Nº pers.'].tolist(): ws.append([legajo])
+    os.makedirs(os.path.dirname(os.path.abspath(ruta)), exist_ok=True)
+    wb.save(ruta)
+    return ruta
+
+def obtener_workbook(filas, semilla=0, con_sheet1=True, hoy=None):
+    # Reutiliza el workbook ya generado para (filas, semilla, fecha de referencia) si existe en benchmarks/datos/
+    hoy = pd.Timestamp(hoy or FECHA_REFERENCIA).normalize()
+    ruta = os.path.join(DATOS_DIR, f"dotacion_{filas}_s{semilla}_{hoy.strftime('%Y%m%d')}{'' if con_sheet1 else '_sin_sheet1'}.xlsx")
+    if not os.path.exists(ruta):
+        df_base = generar_base(filas, semilla, hoy)
+        escribir_workbook(df_base, legajos_activos_anteriores(df_base, semilla, hoy=hoy), ruta, con_sheet1)
+    return ruta
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Genera un workbook sintético de dotación.")
+    parser.add_argument('filas', type=int)
+    parser.add_argument('--semilla', type=int, default=0)
+    parser.add_argument('--hoy', default=FECHA_REFERENCIA, help="Fecha de referencia de los datos (por defecto, %(default)s)")
+    parser.add_argument('--salida', default=None)
+    parser.add_argument('--sin-sheet1', action='store_true')
+    args = parser.parse_args()
+    if args.salida:
+        df_base = generar_base(args.filas, args.semilla, args.hoy)
+        print(escribir_workbook(df_base, legajos_activos_anteriores(df_base, args.semilla, hoy=args.hoy), args.salida, not args.sin_sheet1))
+    else:
+        print(obtener_workbook(args.filas, args.semilla, not args.sin_sheet1, args.hoy))
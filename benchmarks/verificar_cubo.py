@@ -0,0 +1,74 @@
+# Verifica que IndiceDotacion y CuboDotacion den exactamente lo mismo que el cálculo por filas (calcular_activos_a_fecha,
+# filtrar_novedades_por_fecha, pd.crosstab y contar_bajas_por_motivo) sobre bases aleatorias con legajos repetidos,
+# fechas NaT, legajos vacíos (Int32 con NA, como los deja la lectura en streaming, o float con NaN, como pd.read_excel)
+# y Categoría/Línea fuera de las categorías conocidas. Las bajas por motivo se comparan además con value_counts sobre la
+# columna de texto, el cálculo original: mismo orden también en los empates (primera aparición en las filas de bajas).
+# Uso: python benchmarks/verificar_cubo.py [casos] [filas]
+import os
+import sys
+import warnings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+from procesamiento import (ORDEN_CATEGORIAS, ORDEN_LINEAS, CuboDotacion, calcular_activos_a_fecha, contar_bajas_por_motivo,
+                           filtrar_novedades_por_fecha, _normalizar_base)
+
+warnings.simplefilter('ignore', DeprecationWarning)
+
+def base_aleatoria(filas, semilla):
+    rng = np.random.default_rng(semilla)
+    fecha = pd.Timestamp('2015-01-01') + pd.to_timedelta(rng.integers(0, 3650, filas), 'D')
+    desde = fecha + pd.to_timedelta(rng.integers(-30, 1500, filas), 'D')
+    # Pocos legajos distintos: muchos repetidos, con altas y bajas cruzadas entre sus filas
+    legajos = pd.Series(rng.integers(1, max(filas // 3, 2), filas), dtype='Int32' if semilla % 2 == 0 else 'float64')
+    legajos[rng.random(filas) < 0.02] = None
+    df = pd.DataFrame({
+        'Nº pers.': legajos,
+        'Apellido': rng.choice(['PEREZ', 'GOMEZ', 'DIAZ'], filas),
+        'Nombre de pila': rng.choice(['Juan', 'Ana'], filas),
+        'Fecha': fecha, 'Desde': desde,
+        'Fecha nac.': fecha - pd.to_timedelta(rng.integers(7000, 18000, filas), 'D'),
+        'Status ocupación': pd.Categorical(rng.choice(['Activo', 'Dado de baja', 'Suspendido'], filas, p=[0.55, 0.4, 0.05])),
+        'Motivo de la medida': pd.Categorical(rng.choice(['Renuncia', 'Jubilación', 'Despido', 'Ingreso'], filas)),
+        'Gr.prof.': rng.choice(ORDEN_CATEGORIAS + ['OTRA'], filas),
+        'División de personal': rng.choice(ORDEN_LINEAS + ['OTRA'], filas),
+    })
+    for col in ['Fecha', 'Desde']: df.loc[rng.random(filas) < 0.03, col] = pd.NaT
+    return _normalizar_base(df)
+
+def _crosstab(df):
+    return pd.crosstab(df['Categoría'], df['Línea'], margins=True, margins_name="Total")
+
+def _por_motivo_original(df_bajas):
+    conteo = df_bajas['Motivo de la medida'].astype(object).value_counts().to_frame('Cantidad')
+    if not conteo.empty: conteo.loc['Total'] = conteo.sum()
+    return conteo
+
+def verificar(df_base, fechas):
+    legajos_activos = df_base['Nº pers.'].dropna().drop_duplicates().sample(frac=0.5, random_state=0)
+    cubo = CuboDotacion(df_base, legajos_activos)
+    bajas_general = df_base[df_base['Nº pers.'].isin(legajos_activos) & (df_base['Status ocupación'] == 'Dado de baja')]
+    pd.testing.assert_frame_equal(cubo.resumen_general()[3], _por_motivo_original(bajas_general), check_dtype=False, check_names=False, check_index_type=False)
+    for fecha in fechas:
+        activos = calcular_activos_a_fecha(df_base, fecha)
+        assert cubo.indice.total_a_fecha(fecha) == len(activos), (fecha, cubo.indice.total_a_fecha(fecha), len(activos))
+        pd.testing.assert_frame_equal(cubo.resumen_activos(fecha), _crosstab(activos), check_dtype=False)
+    for inicio, fin in zip(fechas[:-1], fechas[1:]):
+        altas, bajas = filtrar_novedades_por_fecha(df_base, inicio, fin)
+        pd.testing.assert_frame_equal(cubo.resumen_altas(inicio, fin), _crosstab(altas), check_dtype=False)
+        bajas = bajas if not bajas.empty else df_base.iloc[:0]
+        pd.testing.assert_frame_equal(cubo.resumen_bajas(inicio, fin), _crosstab(bajas), check_dtype=False)
+        pd.testing.assert_frame_equal(cubo.bajas_por_motivo(inicio, fin), contar_bajas_por_motivo(bajas), check_dtype=False, check_names=False, check_index_type=False)
+        pd.testing.assert_frame_equal(contar_bajas_por_motivo(bajas), _por_motivo_original(bajas), check_dtype=False, check_names=False, check_index_type=False)
+    serie = cubo.indice.serie(fechas, por=None)
+    assert serie.tolist() == [len(calcular_activos_a_fecha(df_base, f)) for f in fechas]
+
+if __name__ == '__main__':
+    casos = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    filas = int(sys.argv[2]) if len(sys.argv) > 2 else 3000
+    fechas = list(pd.date_range('2014-06-30', '2030-01-01', freq='365D'))
+    for semilla in range(casos):
+        verificar(base_aleatoria(filas, semilla), fechas)
+    print(f"{casos} bases de {filas} filas: índice y cubo idénticos al cálculo por filas en {len(fechas)} fechas")
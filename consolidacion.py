@@ -0,0 +1,135 @@
+# --- CONSOLIDACIÓN DE EXPORTES HISTÓRICOS ---
+# Une varios exportes mensuales (pestaña BaseQuery o Sheet1) en una sola base con el mismo formato que
+# procesar_archivo_base, para consultar cualquier rango con resumir_periodo/CuboDotacion o reportes_lote.
+# Cada archivo se lee en un proceso aparte (lectura en streaming y caché de procesar_archivo_base) y se incorpora apenas
+# termina: nunca hay más de `procesos` archivos leídos esperando, y la base acumulada solo guarda registros únicos.
+# Los procesos (fork) son para la línea de comandos; desde la app se usa hilos=True, porque hacer fork de un proceso
+# con varios hilos en marcha (el servidor de Streamlit) puede dejar al hijo bloqueado en un lock tomado por otro hilo.
+# Un mismo episodio (Nº pers. + fecha de alta) puede aparecer en varios exportes: queda la versión del exporte más
+# reciente, que trae el último Status y la fecha de baja ('Desde'). Los exportes se ordenan por su fecha de corte
+# (la última Fecha/Desde que contienen) y, a igual corte, por su posición en la lista.
+# Uso: python consolidacion.py directorio [--salida base.parquet] [--procesos N]
+import argparse
+import io
+import os
+import sys
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from glob import glob
+
+import numpy as np
+import pandas as pd
+from procesamiento import COLUMNAS_CATEGORICAS, _contenido_archivo, procesar_archivo_base
+
+HOJAS_EXPORTE = ('BaseQuery', 'Sheet1')
+CLAVE_EPISODIO = ['Nº pers.', 'Fecha']
+
+def _nombre(archivo):
+    return os.path.basename(str(archivo)) if isinstance(archivo, (str, os.PathLike)) else getattr(archivo, 'name', 'archivo')
+
+def _transportable(archivo):
+    # Las rutas viajan tal cual a los procesos; los archivos subidos, como bytes en memoria
+    return archivo if isinstance(archivo, (str, os.PathLike)) else io.BytesIO(_contenido_archivo(archivo))
+
+def leer_exporte(archivo, hojas=HOJAS_EXPORTE):
+    # (base normalizada, pestaña usada, fecha de corte) de un exporte, con la primera pestaña de `hojas` que exista
+    for hoja in hojas:
+        try:
+            df_base = procesar_archivo_base(archivo, sheet_name=hoja)
+            break
+        except KeyError:
+            continue
+    else:
+        raise ValueError(f"No tiene ninguna de las pestañas {', '.join(hojas)}")
+    corte = pd.concat([df_base['Fecha'], df_base['Desde']]).max()
+    return df_base, hoja, corte
+
+def _concatenar(partes):
+    # Unifica las categorías de Status/Motivo (dependen de cada archivo) para que la concatenación siga siendo categórica
+    for col in COLUMNAS_CATEGORICAS:
+        categorias = pd.Index([c for parte in partes for c in parte[col].cat.categories]).unique()
+        partes = [parte.assign(**{col: parte[col].cat.set_categories(categorias)}) for parte in partes]
+    return pd.concat(partes, ignore_index=True)
+
+def _deduplicar(df):
+    return df.sort_values(['_corte', '_orden'], kind='stable').drop_duplicates(CLAVE_EPISODIO, keep='last')
+
+def consolidar_exportes(archivos, hojas=HOJAS_EXPORTE, procesos=None, hilos=False):
+    # Devuelve (base consolidada, cargas, errores). cargas: un dict por archivo leído con su pestaña, fecha de corte,
+    # filas y 'vigentes' (registros de la base consolidada que salen de ese exporte)
+    archivos = list(archivos)
+    procesos = max(1, min(procesos or os.cpu_count() or 1, len(archivos) or 1))
+    consolidado, cargas, errores = None, [], []
+
+    def incorporar(orden, resultado):
+        nonlocal consolidado
+        df_base, hoja, corte = resultado
+        df_base = df_base.assign(_corte=np.int64(pd.Timestamp(corte).value if pd.notna(corte) else np.iinfo(np.int64).min), _orden=np.int32(orden))
+        consolidado = _deduplicar(df_base if consolidado is None else _concatenar([consolidado, df_base]))
+        cargas.append({'archivo': _nombre(archivos[orden]), 'hoja': hoja, 'corte': corte, 'filas': len(df_base), '_orden': orden})
+
+    if procesos == 1:
+        for orden, archivo in enumerate(archivos):
+            try: incorporar(orden, leer_exporte(archivo, hojas))
+            except Exception as e: errores.append({'archivo': _nombre(archivo), 'error': str(e)})
+    else:
+        Ejecutor = ThreadPoolExecutor if hilos else ProcessPoolExecutor
+        with Ejecutor(max_workers=procesos) as pool:
+            pendientes, siguientes = {}, iter(enumerate(archivos))
+            def enviar():
+                # Ventana de `procesos` archivos en vuelo: los resultados se incorporan antes de pedir más
+                while len(pendientes) < procesos:
+                    orden, archivo = next(siguientes, (None, None))
+                    if orden is None: return
+                    pendientes[pool.submit(leer_exporte, _transportable(archivo), hojas)] = orden
+            enviar()
+            while pendientes:
+                listos, _ = wait(pendientes, return_when=FIRST_COMPLETED)
+                for futuro in listos:
+                    orden = pendientes.pop(futuro)
+                    try: incorporar(orden, futuro.result())
+                    except Exception as e: errores.append({'archivo': _nombre(archivos[orden]), 'error': str(e)})
+                enviar()
+
+    cargas.sort(key=lambda c: (c['corte'] if pd.notna(c['corte']) else pd.Timestamp.min, c['_orden']))
+    vigentes = consolidado['_orden'].value_counts() if consolidado is not None else pd.Series(dtype=np.int64)
+    for carga in cargas: carga['vigentes'] = int(vigentes.get(carga.pop('_orden'), 0))
+    if consolidado is None: return None, cargas, errores
+    consolidado = consolidado.drop(columns=['_corte', '_orden']).sort_values(CLAVE_EPISODIO, kind='stable').reset_index(drop=True)
+    return consolidado, cargas, errores
+
+def consolidar_directorio(directorio, patron='*.xlsx', **kwargs):
+    # Todos los exportes del directorio (sin los temporales '~$' que deja Excel abierto), en orden alfabético
+    archivos = sorted(r for r in glob(os.path.join(directorio, patron)) if not os.path.basename(r).startswith('~$'))
+    return consolidar_exportes(archivos, **kwargs)
+
+def rotacion_mensual(cubo, fecha_inicio, fecha_fin):
+    # Altas, bajas y dotación de cada mes del rango; rotación = bajas / dotación promedio (inicio y cierre del mes)
+    fecha_inicio, fecha_fin = pd.Timestamp(fecha_inicio), pd.Timestamp(fecha_fin)
+    filas = []
+    for mes in pd.date_range(fecha_inicio.replace(day=1), fecha_fin, freq='MS'):
+        inicio, fin = max(mes, fecha_inicio), min(mes + pd.offsets.MonthEnd(0), fecha_fin)
+        altas, bajas, dotacion_cierre = cubo.totales(inicio, fin)
+        dotacion_inicio = cubo.indice.total_a_fecha(inicio - pd.Timedelta(days=1))
+        promedio = (dotacion_inicio + dotacion_cierre) / 2
+        filas.append({'Mes': mes.strftime('%Y-%m'), 'Altas': altas, 'Bajas': bajas, 'Dotación inicial': dotacion_inicio, 'Dotación al cierre': dotacion_cierre, 'Rotación %': round(100 * bajas / promedio, 2) if promedio else 0.0})
+    return pd.DataFrame(filas, columns=['Mes', 'Altas', 'Bajas', 'Dotación inicial', 'Dotación al cierre', 'Rotación %'])
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Consolida un directorio de exportes mensuales en una sola base.")
+    parser.add_argument('directorio', help="Directorio con los exportes .xlsx (pestaña BaseQuery o Sheet1)")
+    parser.add_argument('--salida', default=None, help="Archivo Parquet donde guardar la base consolidada")
+    parser.add_argument('--procesos', type=int, default=None, help="Cantidad de procesos (por defecto, uno por CPU)")
+    args = parser.parse_args(argv)
+
+    base, cargas, errores = consolidar_directorio(args.directorio, procesos=args.procesos)
+    for carga in cargas:
+        corte = carga['corte'].strftime('%d/%m/%Y') if pd.notna(carga['corte']) else '-'
+        print(f"{carga['archivo']:<40} {carga['hoja']:<10} corte {corte:<10} {carga['filas']:>9} filas {carga['vigentes']:>9} vigentes")
+    for error in errores: print(f"Error en {error['archivo']}: {error['error']}", file=sys.stderr)
+    if base is not None:
+        print(f"Base consolidada: {len(base)} registros")
+        if args.salida: base.to_parquet(args.salida, index=False)
+    return 1 if errores or base is None else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,175 @@
+# --- HISTORIAL DE CARGAS (SNAPSHOTS) ---
+# Cada carga del archivo general guarda el estado de la dotación por legajo (Status, Línea, Categoría), ordenado por
+# Nº pers. Solo la primera carga se guarda completa; las siguientes guardan únicamente los cambios respecto de la
+# anterior, calculados con un merge de arrays ordenados. Así se puede consultar qué cambió entre dos cargas
+# cualesquiera sin volver a leer los Excel viejos.
+import json
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+HISTORIAL_DIR = os.environ.get('DOTACION_HISTORIAL_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.historial_dotacion'))
+COLUMNAS_ESTADO = ['Status ocupación', 'Línea', 'Categoría']
+ESPERA_BLOQUEO = 30  # segundos que una carga espera a que termine otra; un bloqueo más viejo que esto se da por abandonado
+
+def estado_dotacion(df_base):
+    # Una fila por legajo (la de Fecha más reciente), ordenada por Nº pers. y con columnas categóricas
+    df = df_base[df_base['Nº pers.'].notna()]
+    legajos = df['Nº pers.'].to_numpy(np.int64)
+    fechas = df['Fecha'].to_numpy('datetime64[ns]').view(np.int64)
+    orden = np.lexsort((fechas, legajos))
+    legajos_ordenados = legajos[orden]
+    ultima = np.append(legajos_ordenados[1:] != legajos_ordenados[:-1], True) if len(orden) else np.zeros(0, dtype=bool)
+    filas = orden[ultima]
+    estado = pd.DataFrame({'Nº pers.': legajos[filas]})
+    for col in COLUMNAS_ESTADO:
+        valores = df[col].iloc[filas].reset_index(drop=True)
+        estado[col] = valores if isinstance(valores.dtype, pd.CategoricalDtype) else pd.Categorical(valores)
+    return estado
+
+def diferencias(estado_anterior, estado_nuevo):
+    # Merge de los dos estados ordenados por legajo: altas (legajos nuevos), bajas (legajos que ya no están)
+    # y cambios de Status, Línea o Categoría
+    anterior, nuevo = estado_anterior['Nº pers.'].to_numpy(), estado_nuevo['Nº pers.'].to_numpy()
+    _, i_ant, i_nue = np.intersect1d(anterior, nuevo, assume_unique=True, return_indices=True)
+    solo_anterior = np.setdiff1d(np.arange(len(anterior)), i_ant, assume_unique=True)
+    solo_nuevo = np.setdiff1d(np.arange(len(nuevo)), i_nue, assume_unique=True)
+
+    modificado = np.zeros(len(i_ant), dtype=bool)
+    for col in COLUMNAS_ESTADO:
+        a = estado_anterior[col].astype(object).to_numpy()[i_ant]
+        b = estado_nuevo[col].astype(object).to_numpy()[i_nue]
+        modificado |= ~((a == b) | (pd.isna(a) & pd.isna(b)))
+    i_ant, i_nue = i_ant[modificado], i_nue[modificado]
+
+    def tramo(cambio, legajos, filas_ant, filas_nue):
+        tramo = pd.DataFrame({'Nº pers.': legajos, 'Cambio': cambio})
+        for col in COLUMNAS_ESTADO:
+            tramo[f'{col} anterior'] = estado_anterior[col].astype(object).to_numpy()[filas_ant] if filas_ant is not None else None
+            tramo[col] = estado_nuevo[col].astype(object).to_numpy()[filas_nue] if filas_nue is not None else None
+        return tramo
+
+    cambios = pd.concat([
+        tramo('Nuevo', nuevo[solo_nuevo], None, solo_nuevo),
+        tramo('Eliminado', anterior[solo_anterior], solo_anterior, None),
+        tramo('Modificado', nuevo[i_nue], i_ant, i_nue),
+    ], ignore_index=True)
+    cambios = cambios.sort_values('Nº pers.', kind='stable', ignore_index=True)
+    for col in ['Cambio'] + [c for c in cambios.columns if c not in ('Nº pers.', 'Cambio')]:
+        cambios[col] = pd.Categorical(cambios[col])
+    return cambios
+
+def aplicar_cambios(estado, cambios):
+    # Estado resultante de aplicar a `estado` los cambios guardados para la carga siguiente
+    reemplazados = cambios.loc[cambios['Cambio'] != 'Nuevo', 'Nº pers.'].to_numpy()
+    conserva = estado[~np.isin(estado['Nº pers.'].to_numpy(), reemplazados, assume_unique=True)]
+    agregados = cambios.loc[cambios['Cambio'] != 'Eliminado', ['Nº pers.'] + COLUMNAS_ESTADO]
+    resultado = pd.concat([conserva.astype({col: object for col in COLUMNAS_ESTADO}), agregados.astype({col: object for col in COLUMNAS_ESTADO})], ignore_index=True)
+    resultado = resultado.sort_values('Nº pers.', kind='stable', ignore_index=True)
+    for col in COLUMNAS_ESTADO: resultado[col] = pd.Categorical(resultado[col])
+    return resultado
+
+class HistorialDotacion:
+    def __init__(self, directorio=HISTORIAL_DIR):
+        self.directorio = directorio
+        self._estados = {}  # Estados ya reconstruidos en esta sesión, por id de carga
+
+    def _ruta(self, nombre):
+        return os.path.join(self.directorio, nombre)
+
+    def cargas(self):
+        try:
+            with open(self._ruta('cargas.json'), encoding='utf-8') as f: return json.load(f)
+        except (OSError, ValueError):
+            return []
+
+    @contextmanager
+    def _bloqueo(self):
+        # El historial se comparte entre sesiones: una carga a la vez lee cargas.json, asigna el id siguiente y escribe
+        # sus archivos. El bloqueo es un archivo creado en forma exclusiva (O_EXCL), que sirve también entre procesos.
+        ruta = self._ruta('cargas.lock')
+        limite = time.monotonic() + ESPERA_BLOQUEO
+        while True:
+            try:
+                os.close(os.open(ruta, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                break
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(ruta) > ESPERA_BLOQUEO: os.remove(ruta)
+                except OSError:
+                    pass
+                if time.monotonic() > limite: raise TimeoutError("El historial de cargas está bloqueado por otra carga")
+                time.sleep(0.05)
+        try:
+            yield
+        finally:
+            try: os.remove(ruta)
+            except OSError: pass
+
+    def _guardar_cargas(self, cargas):
+        tmp = self._ruta(f'cargas.json.{os.getpid()}.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f: json.dump(cargas, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, self._ruta('cargas.json'))
+
+    def registrar(self, df_base, nombre_archivo, huella, fecha=None):
+        # Guarda una nueva carga salvo que sea el mismo archivo que la última; devuelve (carga, cambios respecto de la anterior)
+        os.makedirs(self.directorio, exist_ok=True)
+        estado = estado_dotacion(df_base)
+        with self._bloqueo():
+            return self._registrar(estado, nombre_archivo, huella, fecha)
+
+    def _registrar(self, estado, nombre_archivo, huella, fecha):
+        cargas = self.cargas()
+        if cargas and cargas[-1]['huella'] == huella:
+            carga = cargas[-1]
+            return carga, (self.cambios(cargas[-2]['id'], carga['id']) if len(cargas) > 1 else None)
+
+        carga = {'id': (cargas[-1]['id'] + 1) if cargas else 1, 'archivo': nombre_archivo, 'huella': huella,
+                 'fecha': (fecha or datetime.now()).strftime('%Y-%m-%d %H:%M:%S'), 'legajos': len(estado)}
+        if cargas:
+            cambios = diferencias(self.estado(cargas[-1]['id']), estado)
+            cambios.to_parquet(self._ruta(f"cambios_{carga['id']}.parquet"), index=False)
+            carga['cambios'] = len(cambios)
+        else:
+            cambios = None
+            estado.to_parquet(self._ruta(f"estado_{carga['id']}.parquet"), index=False)
+        # El estado más reciente se guarda completo, con el id de su carga, para comparar la próxima sin reconstruirlo
+        estado.attrs['carga'] = carga['id']
+        tmp = self._ruta(f'estado_actual.parquet.{os.getpid()}.tmp')
+        estado.to_parquet(tmp, index=False)
+        os.replace(tmp, self._ruta('estado_actual.parquet'))
+        self._guardar_cargas(cargas + [carga])
+        self._estados[carga['id']] = estado
+        return carga, cambios
+
+    def estado(self, id_carga):
+        if id_carga in self._estados: return self._estados[id_carga]
+        cargas = self.cargas()
+        ids = [c['id'] for c in cargas]
+        estado = self._estado_actual(id_carga) if id_carga == ids[-1] else None
+        if estado is None:
+            # Estado inicial completo + los cambios de cada carga hasta la pedida
+            estado = pd.read_parquet(self._ruta(f'estado_{ids[0]}.parquet'))
+            for id_siguiente in ids[1:ids.index(id_carga) + 1]:
+                estado = aplicar_cambios(estado, pd.read_parquet(self._ruta(f'cambios_{id_siguiente}.parquet')))
+        self._estados[id_carga] = estado
+        return estado
+
+    def _estado_actual(self, id_carga):
+        # Otra sesión puede registrar una carga entre cargas() y esta lectura: el archivo solo sirve si es de id_carga
+        try:
+            estado = pd.read_parquet(self._ruta('estado_actual.parquet'))
+        except (OSError, ValueError):
+            return None
+        return estado if estado.attrs.get('carga') == id_carga else None
+
+    def cambios(self, id_desde, id_hasta):
+        # Cambios entre dos cargas cualesquiera (si son consecutivas, se leen directamente los guardados)
+        ids = [c['id'] for c in self.cargas()]
+        if ids.index(id_hasta) == ids.index(id_desde) + 1:
+            return pd.read_parquet(self._ruta(f'cambios_{id_hasta}.parquet'))
+        return diferencias(self.estado(id_desde), self.estado(id_hasta))
@@ -0,0 +1,188 @@
+# --- DIAGNÓSTICO DE RENDIMIENTO POR ETAPA ---
+# Instrumentación opcional de las funciones de procesamiento y del pipeline de cada pestaña: tiempo, pico de memoria
+# (tracemalloc) y filas de entrada/salida por etapa. Se activa con DOTACION_DIAGNOSTICO=1 o desde la app; desactivada,
+# cada etapa cuesta una consulta a una ContextVar (el decorador llama directo a la función y etapa() devuelve una etapa vacía).
+# Las mediciones de una ejecución se juntan en un Diagnostico y se escriben como JSON Lines en DOTACION_DIAGNOSTICO_LOG.
+# Activada, tracemalloc hace más lentas las etapas medidas, y el pico de memoria es global al proceso: con varias sesiones
+# midiendo a la vez los picos se mezclan.
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+
+import pandas as pd
+
+DIAGNOSTICO_ACTIVO = os.environ.get('DOTACION_DIAGNOSTICO', '') not in ('', '0')
+DIAGNOSTICO_LOG = os.environ.get('DOTACION_DIAGNOSTICO_LOG', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.diagnostico_dotacion', 'etapas.jsonl'))
+
+# Diagnóstico en curso del hilo/ejecución actual (Streamlit corre cada sesión en su propio hilo)
+_diagnostico_actual = contextvars.ContextVar('diagnostico_actual', default=None)
+_lock_tracemalloc = threading.Lock()
+_usos_tracemalloc = 0
+
+def _filas(valor):
+    if isinstance(valor, (pd.DataFrame, pd.Series)): return len(valor)
+    if isinstance(valor, (tuple, list)):
+        filas = [_filas(v) for v in valor]
+        filas = [f for f in filas if f is not None]
+        return sum(filas) if filas else None
+    return None
+
+class _EtapaVacia:
+    # Lo que devuelve etapa() sin diagnóstico en curso: no mide nada
+    __slots__ = ()
+    def __enter__(self): return self
+    def __exit__(self, *error): return False
+    def filas(self, salida=None, entrada=None): pass
+
+_SIN_ETAPA = _EtapaVacia()
+
+class _Etapa:
+    __slots__ = ('nombre', 'diagnostico', 'contexto', 'filas_entrada', 'filas_salida', '_inicio', '_memoria_inicial', '_pico_hijas', '_nivel', '_orden')
+
+    def __init__(self, diagnostico, nombre, filas_entrada=None, **contexto):
+        self.diagnostico, self.nombre, self.contexto = diagnostico, nombre, contexto
+        self.filas_entrada, self.filas_salida = filas_entrada, None
+
+    def filas(self, salida=None, entrada=None):
+        if salida is not None: self.filas_salida = salida
+        if entrada is not None: self.filas_entrada = entrada
+
+    def __enter__(self):
+        pila = self.diagnostico._pila
+        # tracemalloc tiene un único pico global: se guarda el pico acumulado de la etapa padre antes de reiniciarlo
+        memoria, pico = tracemalloc.get_traced_memory()
+        if pila: pila[-1]._pico_hijas = max(pila[-1]._pico_hijas, pico)
+        tracemalloc.reset_peak()
+        self._memoria_inicial, self._pico_hijas, self._nivel = memoria, 0, len(pila)
+        self._orden = self.diagnostico._iniciadas
+        self.diagnostico._iniciadas += 1
+        pila.append(self)
+        self._inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, tipo_error, error, traza):
+        segundos = time.perf_counter() - self._inicio
+        _, pico = tracemalloc.get_traced_memory()
+        pico = max(pico, self._pico_hijas)
+        pila = self.diagnostico._pila
+        pila.pop()
+        if pila: pila[-1]._pico_hijas = max(pila[-1]._pico_hijas, pico)
+        self.diagnostico.registros.append({
+            'etapa': self.nombre, 'orden': self._orden, 'nivel': self._nivel, 'segundos': segundos,
+            'pico_mb': max(pico - self._memoria_inicial, 0) / 2**20,
+            'filas_entrada': self.filas_entrada, 'filas_salida': self.filas_salida,
+            'error': None if error is None else f"{tipo_error.__name__}: {error}",
+            **self.contexto,
+        })
+        return False
+
+class Diagnostico:
+    # Mediciones de una ejecución (un rerun de la app, un script), en orden de finalización;
+    # 'orden' es el orden de inicio y 'nivel' la profundidad de anidamiento
+    def __init__(self, origen='app'):
+        self.id = uuid.uuid4().hex[:12]
+        self.origen = origen
+        self.fecha = datetime.now()
+        self.registros = []
+        self._pila = []
+        self._iniciadas = 0
+
+    def tabla(self):
+        # Una fila por etapa, en el orden en que empezaron, con las etapas anidadas marcadas con sangría
+        columnas = ['etapa', 'segundos', 'pico_mb', 'filas_entrada', 'filas_salida']
+        if not self.registros: return pd.DataFrame(columns=columnas)
+        df = pd.DataFrame(self.registros).sort_values('orden')
+        df['etapa'] = [('\u2003' * (n - 1) + '↳ ' if n else '') + e for n, e in zip(df['nivel'], df['etapa'])]
+        return df[columnas + (['error'] if df['error'].notna().any() else [])].reset_index(drop=True)
+
+    def guardar(self, ruta=None):
+        # Una línea JSON por etapa, con el id de la ejecución para agruparlas
+        if not self.registros: return
+        ruta = ruta or DIAGNOSTICO_LOG
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(ruta)), exist_ok=True)
+            with open(ruta, 'a', encoding='utf-8') as f:
+                for registro in self.registros:
+                    linea = {'ejecucion': self.id, 'origen': self.origen, 'fecha': self.fecha.isoformat(timespec='seconds'), **registro}
+                    f.write(json.dumps(linea, ensure_ascii=False, default=str) + '\n')
+        except OSError:
+            pass
+
+def _iniciar_tracemalloc():
+    global _usos_tracemalloc
+    with _lock_tracemalloc:
+        if _usos_tracemalloc == 0 and not tracemalloc.is_tracing(): tracemalloc.start()
+        _usos_tracemalloc += 1
+
+def _detener_tracemalloc():
+    global _usos_tracemalloc
+    with _lock_tracemalloc:
+        _usos_tracemalloc -= 1
+        if _usos_tracemalloc == 0: tracemalloc.stop()
+
+def iniciar_diagnostico(activo=None, origen='app'):
+    # Empieza a juntar las etapas del hilo actual. Con activo=False (o sin DOTACION_DIAGNOSTICO) devuelve None
+    # y las etapas no miden nada. Un diagnóstico que quedó abierto (p. ej. un rerun interrumpido) se descarta.
+    anterior = _diagnostico_actual.get()
+    if anterior is not None: terminar_diagnostico(anterior, guardar=False)
+    if not (DIAGNOSTICO_ACTIVO if activo is None else activo): return None
+    diag = Diagnostico(origen)
+    _iniciar_tracemalloc()
+    _diagnostico_actual.set(diag)
+    return diag
+
+def terminar_diagnostico(diag, guardar=True):
+    if diag is None or _diagnostico_actual.get() is not diag: return diag
+    _diagnostico_actual.set(None)
+    _detener_tracemalloc()
+    if guardar: diag.guardar()
+    return diag
+
+@contextmanager
+def diagnostico(activo=None, origen='script', guardar=True):
+    diag = iniciar_diagnostico(activo, origen)
+    try:
+        yield diag
+    finally:
+        terminar_diagnostico(diag, guardar)
+
+def etapa(nombre, filas_entrada=None, **contexto):
+    # with etapa('nombre') as e: ...; e.filas(salida=n). Sin diagnóstico en curso devuelve una etapa vacía.
+    diag = _diagnostico_actual.get()
+    if diag is None: return _SIN_ETAPA
+    return _Etapa(diag, nombre, filas_entrada, **contexto)
+
+def registrar_etapa(nombre, segundos, filas_entrada=None, filas_salida=None, **contexto):
+    # Etapa medida en otro hilo (p. ej. un PDF armado por ReportesPDF): se agrega con su duración y sin pico de memoria,
+    # anidada en la etapa en curso de este hilo. Devuelve False si no hay diagnóstico en curso
+    diag = _diagnostico_actual.get()
+    if diag is None: return False
+    diag.registros.append({
+        'etapa': nombre, 'orden': diag._iniciadas, 'nivel': len(diag._pila), 'segundos': segundos, 'pico_mb': None,
+        'filas_entrada': filas_entrada, 'filas_salida': filas_salida, 'error': None, **contexto,
+    })
+    diag._iniciadas += 1
+    return True
+
+def instrumentar(funcion=None, nombre=None):
+    # Decorador: mide la función como una etapa y cuenta las filas de los DataFrames recibidos y del resultado
+    if funcion is None: return lambda f: instrumentar(f, nombre)
+    nombre = nombre or funcion.__name__
+
+    @functools.wraps(funcion)
+    def envoltura(*args, **kwargs):
+        diag = _diagnostico_actual.get()
+        if diag is None: return funcion(*args, **kwargs)
+        entrada = _filas([a for a in args if isinstance(a, pd.DataFrame)])
+        with _Etapa(diag, nombre, entrada) as medicion:
+            resultado = funcion(*args, **kwargs)
+            medicion.filas(salida=_filas(resultado))
+        return resultado
+    return envoltura
@@ -0,0 +1,732 @@
+import pandas as pd
+from fpdf import FPDF
+from fpdf.util import escape_parens
+from datetime import datetime
+import hashlib
+import io
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from openpyxl import load_workbook
+from instrumentacion import etapa, instrumentar
+
+# --- CACHÉ PERSISTENTE DE HOJAS PROCESADAS ---
+# Clave: hash del contenido del archivo + hoja + versión del procesamiento. Se guarda en Parquet
+# (conserva categorías ordenadas y fechas) y se poda por tamaño, eliminando lo menos usado (LRU por mtime).
+CACHE_DIR = os.environ.get('DOTACION_CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache_dotacion'))
+CACHE_MAX_BYTES = int(os.environ.get('DOTACION_CACHE_MAX_MB', '512')) * 1024 * 1024
+CACHE_VERSION = 'v1'
+
+# --- FORMATO Y MEDICIÓN DE TABLAS EN BLOQUE ---
+_TABLAS_GLIFOS = {}
+# Atributos internos de fpdf2 2.8 que usa la emisión en bloque (PDF._draw_table_rows)
+_INTERNOS_FPDF = ('current_font_is_set_on_page', '_set_font_for_page', '_out', '_record_text_quad_points', '_lasth', 'text_shaping', 'text_color', 'fill_color')
+
+def _tabla_glifos(fuente):
+    # Anchos de glifo (en milésimas de em) de una fuente estándar indexados por código latin-1
+    if fuente.fontkey not in _TABLAS_GLIFOS:
+        _TABLAS_GLIFOS[fuente.fontkey] = np.array([fuente.cw.get(chr(i), 0) for i in range(256)], dtype=np.int64)
+    return _TABLAS_GLIFOS[fuente.fontkey]
+
+def _formatear_miles(serie):
+    # Igual que aplicar f"{x:,.0f}".replace(',', '.') a cada int/float, pero formateando solo los valores distintos
+    codigos, unicos = pd.factorize(serie)
+    formateados = np.array([f"{x:,.0f}".replace(',', '.') if isinstance(x, (int, float)) else x for x in unicos.tolist()] + [None], dtype=object)
+    resultado = formateados[codigos]
+    faltantes = codigos == -1
+    if faltantes.any(): resultado[faltantes] = serie.to_numpy(dtype=object)[faltantes]
+    return pd.Series(resultado, index=serie.index, name=serie.name, dtype=object)
+
+def _formatear_fechas(serie, formato='%d/%m/%Y'):
+    # Igual que serie.dt.strftime(formato) (NaN para NaT), pero formateando solo las fechas distintas
+    codigos, unicos = pd.factorize(serie)
+    formateados = np.array(list(pd.DatetimeIndex(unicos).strftime(formato)) + [np.nan], dtype=object)
+    return pd.Series(formateados[codigos], index=serie.index, name=serie.name, dtype=object)
+
+# --- CLASE MEJORADA PARA CREAR EL PDF EJECUTIVO ---
+class PDF(FPDF):
+    emision_en_bloque = True  # False: todas las filas de las tablas se dibujan con cell()
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.page_width = self.w - 2 * self.l_margin
+        self.report_title = "Resumen de Dotación"
+        self.table_header_data = None 
+
+    def header(self):
+        self.set_font("Arial", "B", 16)
+        self.cell(0, 10, self.report_title, 0, 0, "C")
+        self.ln(15)
+
+    def footer(self):
+        self.set_y(-15)
+        self.set_font("Arial", "I", 8)
+        self.cell(0, 10, str(self.page_no()), 0, 0, "C")
+
+    def _draw_table_header(self):
+        if self.table_header_data:
+            self.set_font("Arial", "B", self.table_header_data['font_size'])
+            self.set_fill_color(70, 130, 180)
+            self.set_text_color(255, 255, 255)
+            for col in self.table_header_data['df_columns']:
+                self.cell(self.table_header_data['widths'][col], 8, str(col), 1, 0, "C", True)
+            self.ln()
+            self.set_text_color(0, 0, 0)
+
+    def draw_table(self, title, df_original, is_crosstab=False):
+        if df_original.empty or (is_crosstab and len(df_original) <= 1 and not (len(df_original) == 1 and df_original.index[0] != "Total")):
+             return
+        
+        df = df_original.copy()
+        if is_crosstab: df = df.replace(0, '-')
+        if df.index.name: df.reset_index(inplace=True)
+        
+        if self.get_y() + (8 * (len(df) + 1) + 10) > self.h - self.b_margin: self.add_page(orientation=self.cur_orientation)
+
+        self.set_font("Arial", "B", 14)
+        self.set_text_color(0, 51, 102)
+        self.cell(0, 10, title, ln=True, align="L")
+        self.ln(2)
+
+        df_formatted = df.copy()
+        for col in df_formatted.columns:
+             if pd.api.types.is_numeric_dtype(df_formatted[col]) and col not in ['Nº pers.', 'Antigüedad']:
+                  df_formatted[col] = _formatear_miles(df_formatted[col])
+             elif pd.api.types.is_datetime64_any_dtype(df_formatted[col]):
+                  df_formatted[col] = _formatear_fechas(df_formatted[col])
+
+        # Textos distintos de cada columna (mismo str() que se dibuja), normalizados para medirlos con la fuente del título
+        valores = df_formatted.to_numpy()
+        columnas = []
+        for j in range(valores.shape[1]):
+            codigos, textos = pd.factorize(np.array([str(v) for v in valores[:, j]], dtype=object))
+            columnas.append((codigos, list(textos), [self.normalize_text(t) for t in textos]))
+        widths = {col: max(self.get_string_width(str(col)) + 8, self._anchos_texto(normalizados).max() + 8) for col, (_, _, normalizados) in zip(df_formatted.columns, columnas)}
+        total_width = sum(widths.values())
+        font_size = 9
+        if total_width > self.page_width:
+            scaling_factor = self.page_width / total_width
+            widths = {k: v * scaling_factor for k, v in widths.items()}
+            font_size = 7
+
+        self.table_header_data = { 'widths': widths, 'font_size': font_size, 'df_columns': df_formatted.columns }
+        self._draw_table_header()
+
+        es_total = np.array(["Total" in str(v) for v in valores[:, 0]], dtype=bool)
+        anchos_col = [widths[col] for col in df_formatted.columns]
+        self._draw_table_rows(columnas, es_total, anchos_col, font_size)
+
+        self.table_header_data = None; self.ln(10)
+
+    def _draw_table_rows(self, columnas, es_total, anchos_col, font_size):
+        # Cortes de página planificados de antemano: la misma suma secuencial de 8 mm por fila que haría get_y()
+        limite = self.h - self.b_margin
+        n_filas, fila = len(es_total), 0
+        anchos_texto, en_bloque = {}, None
+        while fila < n_filas:
+            if self.get_y() + 8 > limite:
+                self.add_page(orientation=self.cur_orientation)
+                self._draw_table_header()
+            ys = np.cumsum(np.concatenate(([self.get_y()], np.full(n_filas - fila - 1, 8.0))))
+            desbordes = np.flatnonzero(ys + 8 > limite)
+            fin = max(fila + 1, fila + (desbordes[0] if len(desbordes) else n_filas - fila))
+
+            pendientes = []
+            for i in range(fila, fin):
+                estilo = "B" if es_total[i] else ""
+                if estilo != self.font_style or self.font_size_pt != font_size:
+                    if pendientes: self._out("\n".join(pendientes)); pendientes = []
+                    self.set_font("Arial", estilo, font_size)
+                if en_bloque:
+                    # cell() fija la fuente en la página recién al escribir el primer texto con ella
+                    if not self.current_font_is_set_on_page: pendientes.append(self._set_font_for_page(self.current_font, self.font_size_pt))
+                    pendientes.extend(self._lineas_fila(columnas, i, anchos_col, self.get_x(), self.get_y(), anchos_texto))
+                    self.y += 8
+                    continue
+
+                # La primera fila de la tabla se dibuja con cell(); si lo que escribió coincide con lo que arma
+                # _lineas_fila, el resto se emite en bloque, sin pasar por cell() celda por celda.
+                if en_bloque is None and not self._emision_en_bloque_disponible(): en_bloque = False
+                if en_bloque is None:
+                    contenido = self.pages[self.page].contents
+                    inicio_emision, x0, y0 = len(contenido), self.get_x(), self.get_y()
+                    esperado = [] if self.current_font_is_set_on_page else [f"BT /F{self.current_font.i} {self.font_size_pt:.2f} Tf ET"]
+                for j, (codigos, textos, _) in enumerate(columnas): self.cell(anchos_col[j], 8, textos[codigos[i]], 1, 0, "C")
+                if en_bloque is None:
+                    esperado += self._lineas_fila(columnas, i, anchos_col, x0, y0, anchos_texto)
+                    en_bloque = bytes(contenido[inicio_emision:]) == ("\n".join(esperado) + "\n").encode("latin1")
+                self.ln()
+            if pendientes:
+                self._out("\n".join(pendientes))
+                self.x, self._lasth = self.l_margin, 8
+            fila = fin
+
+    def _emision_en_bloque_disponible(self):
+        # La emisión en bloque escribe el contenido de la página con internos de fpdf2 2.8 (ver requirements.txt);
+        # si esta versión no los tiene, la tabla se dibuja con cell()
+        if not self.emision_en_bloque or not all(hasattr(self, a) for a in _INTERNOS_FPDF): return False
+        if not (isinstance(self.pages, dict) and hasattr(self.pages.get(self.page), 'contents') and hasattr(self.current_font, 'i')): return False
+        return self._medicion_en_bloque_disponible() and not self.text_shaping and not self._record_text_quad_points
+
+    def _medicion_en_bloque_disponible(self):
+        # La tabla de glifos sale del modelo de fuentes de fpdf2 2.8 (current_font con fontkey y cw)
+        fuente = self.current_font
+        return (hasattr(fuente, 'fontkey') and hasattr(fuente, 'cw') and hasattr(self, 'font_size_pt')
+                and getattr(self, 'is_ttf_font', True) is False and getattr(self, 'font_stretching', None) == 100 and getattr(self, 'char_spacing', None) == 0)
+
+    def _anchos_texto(self, textos):
+        # Ancho (en unidades de usuario) de textos ya normalizados con la fuente actual, usando la tabla de anchos
+        # de glifos de la fuente: mismo cálculo que get_string_width para las fuentes estándar
+        if not self._medicion_en_bloque_disponible():
+            return np.array([self.get_string_width(t, normalized=True) for t in textos])
+        glifos = _tabla_glifos(self.current_font)[np.frombuffer("".join(textos).encode("latin1"), dtype=np.uint8)]
+        acumulado = np.concatenate(([0], np.cumsum(glifos)))
+        largos = np.array([len(t) for t in textos], dtype=np.int64)
+        fines = np.cumsum(largos)
+        sumas = acumulado[fines] - acumulado[fines - largos]
+        return np.array([int(suma) * self.font_size_pt * 0.001 / self.k for suma in sumas])
+
+    def _lineas_fila(self, columnas, fila, anchos_col, x, y, anchos_texto):
+        # Reproduce el contenido que escribe cell(w, 8, texto, 1, 0, "C") para cada celda de la fila
+        k, h, clave_fuente = self.k, 8, (self.current_font.fontkey, self.font_size_pt)
+        color = self.text_color.serialize().lower() if self.text_color != self.fill_color else None
+        top, bottom = (self.h - y) * k, (self.h - (y + h)) * k
+        base_texto = (self.h - y - 0.5 * h - 0.3 * self.font_size) * k
+        lineas = []
+        for j, (codigos, _, normalizados) in enumerate(columnas):
+            w = anchos_col[j]
+            left, right = x * k, (x + w) * k
+            linea = f"{left:.2f} {top:.2f} {right-left:.2f} {bottom-top:.2f} re S"
+            texto = normalizados[codigos[fila]]
+            if texto:
+                if (clave_fuente, j) not in anchos_texto: anchos_texto[(clave_fuente, j)] = self._anchos_texto(normalizados)
+                dx = (w - anchos_texto[(clave_fuente, j)][codigos[fila]]) / 2
+                linea += f" BT {(x + dx) * k:.2f} {base_texto:.2f} Td" + (f" {color}" if color else "") + f" ({escape_parens(texto)}) Tj ET"
+                if color: linea = f"q {linea} Q"
+            lineas.append(linea)
+            x += w
+        return lineas
+
+@instrumentar
+def crear_pdf_reporte(titulo_reporte, rango_fechas_str, df_altas, df_bajas, bajas_por_motivo, resumen_altas, resumen_bajas, resumen_activos):
+    pdf = PDF(orientation='L', unit='mm', format='A4')
+    pdf.report_title = titulo_reporte
+    pdf.add_page()
+    
+    fecha_final = rango_fechas_str.split(' - ')[-1]
+    pdf.draw_table(f"Resumen de Bajas (Período: {rango_fechas_str})", resumen_bajas, is_crosstab=True)
+    pdf.draw_table(f"Resumen de Altas (Período: {rango_fechas_str})", resumen_altas, is_crosstab=True)
+    pdf.draw_table(f"Composición de la Dotación Activa (Al {fecha_final})", resumen_activos, is_crosstab=True)
+
+    pdf.add_page()
+    pdf.set_font("Arial", "B", 14)
+    pdf.set_text_color(0, 51, 102)
+    pdf.cell(0, 10, f"Novedades del Período: {rango_fechas_str}", ln=True)
+    pdf.set_font("Arial", "", 12); pdf.set_text_color(0, 0, 0)
+    pdf.cell(0, 8, f"- Cantidad de Altas: {len(df_altas)}", ln=True)
+    pdf.cell(0, 8, f"- Cantidad de Bajas: {len(df_bajas)}", ln=True)
+    pdf.ln(5)
+
+    if not df_altas.empty: pdf.draw_table("Detalle de Altas", df_altas[['Nº pers.', 'Apellido', 'Nombre de pila', 'Fecha nac.', 'Fecha', 'Línea', 'Categoría']])
+    if not df_bajas.empty: pdf.draw_table("Detalle de Bajas", df_bajas[['Nº pers.', 'Apellido', 'Nombre de pila', 'Motivo de la medida', 'Fecha nac.', 'Antigüedad', 'Desde', 'Línea', 'Categoría']])
+    if not bajas_por_motivo.empty: pdf.draw_table("Bajas por Motivo", bajas_por_motivo)
+
+    return bytes(pdf.output())
+
+# --- PDFs BAJO DEMANDA ---
+# Los PDF se arman recién cuando se piden (y, si se quiere, en un hilo de fondo mientras la app sigue mostrando las
+# tablas). Quedan en memoria por clave (huella de los datos, tipo de reporte, período): cambiar una fecha y volver
+# a la anterior no rearma nada. Se descartan los menos usados al pasar max_reportes; los que fallan se reintentan.
+# El hilo de fondo no tiene el diagnóstico de la sesión que pidió el PDF: cada Future guarda (bytes, segundos de armado)
+# para que la app lo informe como etapa.
+class ReportesPDF:
+    def __init__(self, max_reportes=32, hilos=1):
+        self.max_reportes = max_reportes
+        self._pool = ThreadPoolExecutor(max_workers=hilos, thread_name_prefix='reportes_pdf')
+        self._futuros = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _armar(funcion, args, kwargs):
+        inicio = time.perf_counter()
+        pdf = funcion(*args, **kwargs)
+        return pdf, time.perf_counter() - inicio
+
+    def solicitar(self, clave, funcion, *args, **kwargs):
+        # Encola la generación si la clave no está lista ni en curso y devuelve el Future correspondiente
+        with self._lock:
+            futuro = self._futuros.get(clave)
+            if futuro is not None and not (futuro.done() and futuro.exception() is not None):
+                self._futuros.move_to_end(clave)
+                return futuro
+            futuro = self._futuros[clave] = self._pool.submit(self._armar, funcion, args, kwargs)
+            self._podar()
+            return futuro
+
+    def generar(self, clave, funcion, *args, **kwargs):
+        # Versión bloqueante de solicitar: devuelve los bytes del PDF
+        return self.solicitar(clave, funcion, *args, **kwargs).result()[0]
+
+    def consultar(self, clave):
+        # (estado, valor, segundos) a partir de una sola lectura del Future, que otra sesión puede descartar en cualquier
+        # momento: (None, None, None) si nunca se pidió, ('pendiente', None, None), ('error', excepción, None) o
+        # ('listo', bytes del PDF, segundos que tardó en armarse)
+        with self._lock: futuro = self._futuros.get(clave)
+        if futuro is None: return None, None, None
+        if not futuro.done(): return 'pendiente', None, None
+        if futuro.exception() is not None: return 'error', futuro.exception(), None
+        return ('listo', *futuro.result())
+
+    def estado(self, clave):
+        # None (nunca pedido), 'pendiente', 'listo' o 'error'
+        return self.consultar(clave)[0]
+
+    def obtener(self, clave):
+        # Bytes del PDF si ya está listo; None si no se pidió, sigue en curso o falló
+        estado, valor, _ = self.consultar(clave)
+        return valor if estado == 'listo' else None
+
+    def error(self, clave):
+        estado, valor, _ = self.consultar(clave)
+        return valor if estado == 'error' else None
+
+    def _podar(self):
+        terminados = [c for c, f in self._futuros.items() if f.done()]
+        for clave in terminados[:max(len(self._futuros) - self.max_reportes, 0)]: del self._futuros[clave]
+
+def _contenido_archivo(archivo_cargado):
+    if isinstance(archivo_cargado, (str, os.PathLike)):
+        with open(archivo_cargado, 'rb') as f: return f.read()
+    if hasattr(archivo_cargado, 'getvalue'): return archivo_cargado.getvalue()
+    archivo_cargado.seek(0); contenido = archivo_cargado.read(); archivo_cargado.seek(0)
+    return contenido
+
+def huella_archivo(archivo_cargado):
+    return hashlib.sha256(_contenido_archivo(archivo_cargado)).hexdigest()
+
+def _ruta_cache(contenido, sheet_name, tipo):
+    clave = hashlib.sha256(contenido).hexdigest()
+    hoja = hashlib.sha256(sheet_name.encode('utf-8')).hexdigest()[:12]
+    return os.path.join(CACHE_DIR, f"{clave}_{hoja}_{tipo}_{CACHE_VERSION}.parquet")
+
+def _leer_cache(ruta):
+    try:
+        df = pd.read_parquet(ruta)
+    except (OSError, ValueError):
+        return None
+    try: os.utime(ruta)  # Marca el uso para la política LRU
+    except OSError: pass
+    return df
+
+def _podar_cache():
+    # Varios escritores (sesiones, workers de la consolidación) podan a la vez: lo que otro ya borró se saltea
+    try:
+        entradas = [e for e in os.scandir(CACHE_DIR) if e.name.endswith('.parquet')]
+    except OSError:
+        return
+    datos = []
+    for e in entradas:
+        try:
+            info = e.stat()
+        except OSError:
+            continue
+        datos.append((info.st_mtime, info.st_size, e.path))
+    total = 0
+    for i, (_, tamano, ruta) in enumerate(sorted(datos, reverse=True)):
+        total += tamano
+        if total > CACHE_MAX_BYTES and i > 0:
+            try: os.remove(ruta)
+            except OSError: pass
+
+def _guardar_cache(df, ruta):
+    # La caché es opcional: si no se puede escribir (directorio inválido o de solo lectura, disco lleno, columnas con
+    # tipos mezclados) se sigue sin ella
+    tmp = f"{ruta}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        df.to_parquet(tmp, index=False)
+        os.replace(tmp, ruta)
+    except Exception:
+        try: os.remove(tmp)
+        except OSError: pass
+        return
+    _podar_cache()
+
+@instrumentar
+def leer_hoja(archivo_cargado, sheet_name):
+    contenido = _contenido_archivo(archivo_cargado)
+    ruta = _ruta_cache(contenido, sheet_name, 'raw')
+    df = _leer_cache(ruta)
+    if df is None:
+        df = pd.read_excel(io.BytesIO(contenido), sheet_name=sheet_name, engine='openpyxl')
+        _guardar_cache(df, ruta)
+    return df
+
+# --- LECTURA EN STREAMING CON PROYECCIÓN DE COLUMNAS ---
+# Solo se leen las columnas que usa la app y con tipos fijados de antemano, así la memoria y el tiempo
+# dependen de estas columnas y no del ancho total del export.
+COLUMNAS_BASE = ['Nº pers.', 'Apellido', 'Nombre de pila', 'Fecha', 'Desde', 'Fecha nac.', 'Status ocupación', 'Motivo de la medida', 'Gr.prof.', 'División de personal']
+COLUMNAS_FECHA = ['Fecha', 'Desde', 'Fecha nac.']
+COLUMNAS_CATEGORICAS = ['Status ocupación', 'Motivo de la medida']
+ORDEN_LINEAS = ['ROCA', 'MITRE', 'SARMIENTO', 'SAN MARTIN', 'BELGRANO SUR', 'REGIONALES', 'CENTRAL']
+ORDEN_CATEGORIAS = ['COOR.E.T', 'INST.TEC', 'INS.CERT', 'CON.ELEC', 'CON.DIES', 'AY.CON.H', 'AY.CONDU', 'ASP.AY.C']
+
+def _leer_hoja_streaming(contenido, sheet_name, columnas=COLUMNAS_BASE):
+    wb = load_workbook(io.BytesIO(contenido), read_only=True, data_only=True)
+    try:
+        filas = wb[sheet_name].iter_rows(values_only=True)
+        encabezado = list(next(filas, ()))
+        proyeccion = [(col, encabezado.index(col)) for col in columnas if col in encabezado]
+        valores = {col: [] for col, _ in proyeccion}
+        ultima_fila_con_datos = 0
+        for fila in filas:
+            vacia = True
+            for col, i in proyeccion:
+                v = fila[i] if i < len(fila) else None
+                valores[col].append(v)
+                if v is not None: vacia = False
+            if not vacia: ultima_fila_con_datos = len(valores[proyeccion[0][0]])
+    finally:
+        wb.close()
+
+    df = pd.DataFrame(index=pd.RangeIndex(ultima_fila_con_datos))
+    for col, _ in proyeccion:
+        v = valores.pop(col)[:ultima_fila_con_datos]
+        if col == 'Nº pers.':
+            legajos = pd.to_numeric(pd.Series(v, dtype=object), errors='coerce')
+            if legajos.isna().any(): df[col] = legajos.astype('Int32')
+            elif legajos.empty or legajos.abs().max() <= np.iinfo(np.int32).max: df[col] = legajos.astype('int32')
+            else: df[col] = legajos.astype('int64')
+        elif col in COLUMNAS_FECHA: df[col] = pd.to_datetime(pd.Series(v, dtype=object), errors='coerce')
+        elif col in COLUMNAS_CATEGORICAS: df[col] = pd.Categorical(v)
+        else: df[col] = pd.Series(v, dtype=object).infer_objects()
+    return df
+
+@instrumentar
+def procesar_archivo_base(archivo_cargado, sheet_name='BaseQuery', modo='streaming'):
+    # modo='streaming': solo COLUMNAS_BASE con tipos compactos. modo='completo': todas las columnas vía pd.read_excel.
+    contenido = _contenido_archivo(archivo_cargado)
+    ruta = _ruta_cache(contenido, sheet_name, f'base-{modo}')
+    with etapa('caché (lectura)'): df_base = _leer_cache(ruta)
+    if df_base is None:
+        with etapa(f'Excel ({modo})') as medicion:
+            if modo == 'streaming': df_raw = _leer_hoja_streaming(contenido, sheet_name)
+            else: df_raw = pd.read_excel(io.BytesIO(contenido), sheet_name=sheet_name, engine='openpyxl')
+            medicion.filas(salida=len(df_raw))
+        df_base = _normalizar_base(df_raw)
+        with etapa('caché (escritura)'): _guardar_cache(df_base, ruta)
+    return df_base
+
+def _normalizar_base(df_base):
+    df_base.rename(columns={'Gr.prof.': 'Categoría', 'División de personal': 'Línea'}, inplace=True)
+    for col in ['Fecha', 'Desde', 'Fecha nac.']:
+        if col in df_base.columns: df_base[col] = pd.to_datetime(df_base[col], errors='coerce')
+    
+    df_base['Línea'] = pd.Categorical(df_base['Línea'], categories=ORDEN_LINEAS, ordered=True)
+    df_base['Categoría'] = pd.Categorical(df_base['Categoría'], categories=ORDEN_CATEGORIAS, ordered=True)
+    return df_base
+
+def _codigos_motivo(motivo):
+    # Códigos y motivos de la columna 'Motivo de la medida', categórica o de texto (-1 = sin motivo)
+    if isinstance(motivo.dtype, pd.CategoricalDtype): return motivo.cat.codes.to_numpy(np.int64), list(motivo.cat.categories)
+    codigos, motivos = pd.factorize(motivo)
+    return codigos.astype(np.int64), list(motivos)
+
+def _orden_aparicion(codigos, n_motivos):
+    # Posición de cada motivo según su primera aparición en codigos (n_motivos para los que no aparecen)
+    vistos = pd.unique(codigos[codigos >= 0])
+    orden = np.full(n_motivos, n_motivos, dtype=np.int64)
+    orden[vistos] = np.arange(len(vistos))
+    return orden
+
+def _tabla_por_motivo(motivos, conteos, primeras):
+    # Bajas por motivo de mayor a menor, como value_counts sobre la columna de texto: los empates quedan en el orden
+    # en que cada motivo aparece primero en las filas de bajas (no en el de las categorías), y sin motivos en cero
+    orden = np.lexsort((primeras, -conteos))
+    orden = orden[conteos[orden] > 0]
+    bajas_por_motivo = pd.DataFrame({'Cantidad': conteos[orden].astype(np.int64)}, index=pd.Index([motivos[i] for i in orden], dtype=object, name='Motivo de la medida'))
+    if not bajas_por_motivo.empty: bajas_por_motivo.loc['Total'] = bajas_por_motivo.sum()
+    return bajas_por_motivo
+
+@instrumentar
+def contar_bajas_por_motivo(df_bajas_raw):
+    codigos, motivos = _codigos_motivo(df_bajas_raw['Motivo de la medida'])
+    conteos = np.bincount(codigos[codigos >= 0], minlength=len(motivos))
+    return _tabla_por_motivo(motivos, conteos, _orden_aparicion(codigos, len(motivos)))
+
+@instrumentar
+def formatear_y_procesar_novedades(df_altas_raw, df_bajas_raw):
+    # Las fechas quedan como datetime: se formatean (dd/mm/aaaa) recién al mostrarlas o al dibujar el PDF
+    if not df_bajas_raw.empty:
+        df_bajas = df_bajas_raw.assign(**{'Antigüedad': ((datetime.now() - df_bajas_raw['Fecha']) / pd.Timedelta(days=365.25)).fillna(0).astype(int)})
+    else:
+        df_bajas = pd.DataFrame(columns=['Nº pers.', 'Apellido', 'Nombre de pila', 'Motivo de la medida', 'Fecha nac.', 'Antigüedad', 'Desde', 'Línea', 'Categoría'])
+    
+    if not df_altas_raw.empty:
+        df_altas = df_altas_raw
+    else:
+        df_altas = pd.DataFrame(columns=['Nº pers.', 'Apellido', 'Nombre de pila', 'Fecha nac.', 'Fecha', 'Línea', 'Categoría'])
+    return df_altas, df_bajas
+
+@instrumentar
+def filtrar_novedades_por_fecha(df_base_para_filtrar, fecha_inicio, fecha_fin):
+    # Una sola pasada con máscaras sobre la base; solo se materializan las filas del período
+    df = df_base_para_filtrar
+    fecha_inicio, fecha_fin = pd.Timestamp(fecha_inicio), pd.Timestamp(fecha_fin)
+    fecha = df['Fecha']
+    altas_filtradas = df[(fecha >= fecha_inicio) & (fecha <= fecha_fin)]
+
+    es_baja = (df['Status ocupación'] == 'Dado de baja').to_numpy()
+    if es_baja.any():
+        # CORRECCIÓN: la baja cuenta el día anterior a 'Desde'. Se corren los límites en vez de restar 1 día a toda la columna
+        desde = df['Desde']
+        un_dia = pd.Timedelta(days=1)
+        bajas_filtradas = df[es_baja & ((desde >= fecha_inicio + un_dia) & (desde <= fecha_fin + un_dia)).to_numpy()]
+        # CORRECCIÓN: Sobrescribir la columna 'Desde' con la fecha corregida antes de devolverla
+        if not bajas_filtradas.empty:
+            fecha_baja_corregida = bajas_filtradas['Desde'] - un_dia
+            bajas_filtradas = bajas_filtradas.assign(**{'Desde': fecha_baja_corregida, 'fecha_baja_corregida': fecha_baja_corregida})
+        else:
+            bajas_filtradas = bajas_filtradas.assign(fecha_baja_corregida=bajas_filtradas['Desde'])
+    else:
+        bajas_filtradas = pd.DataFrame()
+    return altas_filtradas, bajas_filtradas
+
+@instrumentar
+def calcular_activos_a_fecha(df_base, fecha_fin):
+    fecha_fin = pd.Timestamp(fecha_fin)
+    hasta_fecha = (df_base['Fecha'] <= fecha_fin).to_numpy()
+    status = df_base['Status ocupación']
+    activos = hasta_fecha & (status == 'Activo').to_numpy()
+
+    # Legajos dados de baja después de fecha_fin (Desde - 1 día > fecha_fin): cuentan todas sus filas, como el isin original
+    baja_posterior = hasta_fecha & (status == 'Dado de baja').to_numpy() & (df_base['Desde'] > fecha_fin + pd.Timedelta(days=1)).to_numpy()
+    if baja_posterior.any():
+        legajos = df_base['Nº pers.']
+        activos |= hasta_fecha & legajos.isin(legajos[baja_posterior]).to_numpy()
+    return df_base[activos]
+
+def _crosstab_desde_matriz(matriz, categorias, lineas):
+    # Arma, a partir de una matriz de conteos Categoría×Línea, el mismo DataFrame que devuelve
+    # pd.crosstab(df['Categoría'], df['Línea'], margins=True, margins_name="Total"): sin filas ni columnas en cero
+    filas, columnas = matriz.sum(axis=1) > 0, matriz.sum(axis=0) > 0
+    if not filas.any():
+        vacio = lambda nombre, valores: pd.Series(pd.Categorical([], categories=valores, ordered=True), name=nombre)
+        return pd.crosstab(vacio('Categoría', categorias), vacio('Línea', lineas), margins=True, margins_name="Total")
+    resumen = pd.DataFrame(matriz[filas][:, columnas].astype(np.int64), index=pd.Index([c for c, f in zip(categorias, filas) if f], name='Categoría'), columns=pd.Index([l for l, f in zip(lineas, columnas) if f], name='Línea'))
+    resumen['Total'] = resumen.sum(axis=1)
+    resumen.loc['Total'] = resumen.sum(axis=0)
+    return resumen
+
+# --- ÍNDICE DE DOTACIÓN A FECHA ---
+# Cada fila de la base se convierte en intervalos [inicio, fin) durante los que calcular_activos_a_fecha la cuenta
+# como activa. Por celda Categoría×Línea se guardan los inicios y fines ordenados: la dotación a una fecha D es
+# #(inicio <= D) - #(fin <= D), dos búsquedas binarias, y una serie completa de fechas es un solo searchsorted.
+_FIN_ABIERTO = np.iinfo(np.int64).max
+
+def _fechas_ns(valores):
+    return pd.DatetimeIndex(pd.to_datetime(valores)).as_unit('ns').asi8
+
+class IndiceDotacion:
+    def __init__(self, df_base):
+        self.categorias = list(df_base['Categoría'].cat.categories)
+        self.lineas = list(df_base['Línea'].cat.categories)
+        n_lin = len(self.lineas) + 1
+        # Celda 0 de cada eje = valor fuera de las categorías (NaN): no aparece en los crosstabs pero sí en el total
+        celda = (df_base['Categoría'].cat.codes.to_numpy(np.int64) + 1) * n_lin + df_base['Línea'].cat.codes.to_numpy(np.int64) + 1
+        fecha = _fechas_ns(df_base['Fecha'])
+        desde = _fechas_ns(df_base['Desde'])
+        status = df_base['Status ocupación'].to_numpy(dtype=object)
+        con_fecha = fecha != np.iinfo(np.int64).min
+        es_activo = (status == 'Activo') & con_fecha
+
+        # Activos: cuentan desde su fecha de alta en adelante
+        inicios, fines, celdas = [fecha[es_activo]], [np.full(es_activo.sum(), _FIN_ABIERTO)], [celda[es_activo]]
+
+        # El resto cuenta mientras alguna baja de su mismo legajo (incluida la propia) esté dada de alta y aún no
+        # llegó a su fecha corregida (Desde - 1 día), igual que el isin de calcular_activos_a_fecha. Con legajos Int32
+        # (la lectura en streaming, si hay celdas vacías) isin no empareja NA con NA: esas filas quedan fuera del merge
+        legajos = df_base['Nº pers.']
+        con_legajo = legajos.notna().to_numpy() if isinstance(legajos.dtype, pd.api.extensions.ExtensionDtype) else np.ones(len(df_base), dtype=bool)
+        es_baja = (status == 'Dado de baja') & con_fecha & (desde != np.iinfo(np.int64).min) & con_legajo
+        bajas = pd.DataFrame({'legajo': legajos.to_numpy()[es_baja], 'alta_baja': fecha[es_baja], 'fin': desde[es_baja] - pd.Timedelta(days=1).value})
+        resto = ~es_activo & con_fecha & con_legajo
+        filas = pd.DataFrame({'fila': np.flatnonzero(resto), 'legajo': legajos.to_numpy()[resto], 'alta': fecha[resto]})
+        pares = filas.merge(bajas, on='legajo')
+        pares['inicio'] = np.maximum(pares['alta'].to_numpy(), pares['alta_baja'].to_numpy())
+        pares = pares[pares['inicio'] < pares['fin']].sort_values(['fila', 'inicio'], kind='stable')
+        if not pares.empty:
+            # Unión de intervalos solapados por fila (solo hay más de uno con legajos repetidos)
+            fin_previo = pares.groupby('fila')['fin'].cummax().groupby(pares['fila']).shift()
+            tramo = (fin_previo.isna() | (pares['inicio'] > fin_previo)).cumsum()
+            pares = pares.groupby(tramo).agg(fila=('fila', 'first'), inicio=('inicio', 'min'), fin=('fin', 'max'))
+        inicios.append(pares['inicio'].to_numpy(np.int64)); fines.append(pares['fin'].to_numpy(np.int64)); celdas.append(celda[pares['fila'].to_numpy(np.int64)])
+
+        inicios, fines, celdas = np.concatenate(inicios), np.concatenate(fines), np.concatenate(celdas)
+        self.n_celdas = (len(self.categorias) + 1) * n_lin
+        orden_ini, orden_fin = np.lexsort((inicios, celdas)), np.lexsort((fines, celdas))
+        self.inicios, self.fines = inicios[orden_ini], fines[orden_fin]
+        self.limites = np.searchsorted(celdas[orden_ini], np.arange(self.n_celdas + 1))
+
+    def _conteos(self, fechas_ns):
+        # Matriz (fechas × celdas) de dotación activa
+        conteos = np.zeros((len(fechas_ns), self.n_celdas), dtype=np.int64)
+        for c in range(self.n_celdas):
+            a, b = self.limites[c], self.limites[c + 1]
+            if a == b: continue
+            conteos[:, c] = np.searchsorted(self.inicios[a:b], fechas_ns, side='right') - np.searchsorted(self.fines[a:b], fechas_ns, side='right')
+        return conteos
+
+    def _matriz(self, conteos):
+        # Descarta la fila/columna de valores fuera de categoría: (fechas × Categoría × Línea)
+        return conteos.reshape(len(conteos), len(self.categorias) + 1, len(self.lineas) + 1)[:, 1:, 1:]
+
+    def total_a_fecha(self, fecha):
+        return int(self._conteos(_fechas_ns([fecha])).sum())
+
+    def activos_a_fecha(self, fecha):
+        # Mismo resultado que pd.crosstab(activos['Categoría'], activos['Línea'], margins=True, margins_name="Total")
+        return _crosstab_desde_matriz(self._matriz(self._conteos(_fechas_ns([fecha])))[0], self.categorias, self.lineas)
+
+    def serie(self, fechas, por='Línea'):
+        # Dotación activa para cada fecha, desglosada por 'Línea' o 'Categoría' (o solo el total con por=None)
+        fechas = pd.DatetimeIndex(pd.to_datetime(fechas))
+        conteos = self._conteos(_fechas_ns(fechas))
+        total = conteos.sum(axis=1)
+        if por is None: return pd.Series(total, index=fechas, name='Total')
+        matriz = self._matriz(conteos)
+        if por == 'Línea': serie = pd.DataFrame(matriz.sum(axis=1), index=fechas, columns=self.lineas)
+        else: serie = pd.DataFrame(matriz.sum(axis=2), index=fechas, columns=self.categorias)
+        serie['Total'] = total
+        return serie
+
+    def serie_anual(self, anio, frecuencia='D', por='Línea'):
+        # frecuencia: 'D' diaria o 'W' semanal (cierre de cada domingo)
+        fechas = pd.date_range(f'{anio}-01-01', f'{anio}-12-31', freq='W-SUN' if frecuencia == 'W' else 'D')
+        return self.serie(fechas, por=por)
+
+# --- CUBO DE AGREGADOS POR CATEGORÍA×LÍNEA ---
+# Se arma una vez por base y de él salen todos los resúmenes (altas, bajas, activos y bajas por motivo) de las pestañas
+# y de los reportes. Los eventos de alta (Fecha) y de baja (Desde - 1 día) quedan ordenados por celda, de modo que
+# cualquier período se resuelve con conteos acumulados (dos búsquedas binarias por celda) en vez de crosstabs sobre filas.
+class _EventosOrdenados:
+    def __init__(self, grupos, fechas_ns, n_grupos, filas=None):
+        # filas (opcional): posición en la base de cada evento, para saber cuál aparece primero en un período
+        orden = np.lexsort((fechas_ns, grupos))
+        self.fechas = fechas_ns[orden]
+        self.filas = None if filas is None else filas[orden]
+        self.limites = np.searchsorted(grupos[orden], np.arange(n_grupos + 1))
+
+    def _tramos(self, inicio_ns, fin_ns):
+        # Por grupo, el tramo [desde, hasta) de self.fechas con inicio <= fecha <= fin
+        desde, hasta = self.limites[:-1].copy(), self.limites[:-1].copy()
+        for g in np.flatnonzero(np.diff(self.limites)):
+            a = self.limites[g]
+            fechas = self.fechas[a:self.limites[g + 1]]
+            desde[g], hasta[g] = a + np.searchsorted(fechas, inicio_ns, side='left'), a + np.searchsorted(fechas, fin_ns, side='right')
+        return desde, hasta
+
+    def contar(self, inicio_ns, fin_ns):
+        # Eventos por grupo con inicio <= fecha <= fin
+        desde, hasta = self._tramos(inicio_ns, fin_ns)
+        return hasta - desde
+
+    def contar_y_primeras(self, inicio_ns, fin_ns):
+        # Además de los conteos, la menor fila de la base entre los eventos de cada grupo en el período
+        desde, hasta = self._tramos(inicio_ns, fin_ns)
+        primeras = np.full(len(desde), np.iinfo(np.int64).max)
+        for g in np.flatnonzero(hasta > desde): primeras[g] = self.filas[desde[g]:hasta[g]].min()
+        return hasta - desde, primeras
+
+class CuboDotacion:
+    @instrumentar(nombre='CuboDotacion')
+    def __init__(self, df_base, legajos_activos=None):
+        self.indice = IndiceDotacion(df_base)
+        self.categorias, self.lineas = self.indice.categorias, self.indice.lineas
+        self._forma = (len(self.categorias) + 1, len(self.lineas) + 1)
+        celda, n_celdas = self._celdas(df_base), self._forma[0] * self._forma[1]
+        status = df_base['Status ocupación'].to_numpy(dtype=object)
+        es_baja = status == 'Dado de baja'
+
+        codigos_motivo, self.motivos = _codigos_motivo(df_base['Motivo de la medida'])
+        con_motivo = codigos_motivo >= 0
+
+        # Conteos sin fecha de la comparación con la pestaña 'Activos' (tabs 1 y 2): se agregan con comparar_activos
+        self.activos_general = self.bajas_general = self.altas_general = self.motivos_general = self.motivos_general_orden = None
+        if legajos_activos is not None: self.comparar_activos(df_base, legajos_activos)
+
+        # Eventos con fecha para los reportes por período
+        fecha, desde = _fechas_ns(df_base['Fecha']), _fechas_ns(df_base['Desde'])
+        nat = np.iinfo(np.int64).min
+        con_fecha = fecha != nat
+        bajas = es_baja & (desde != nat)
+        fecha_baja = desde[bajas] - pd.Timedelta(days=1).value
+        self.altas = _EventosOrdenados(celda[con_fecha], fecha[con_fecha], n_celdas)
+        self.bajas = _EventosOrdenados(celda[bajas], fecha_baja, n_celdas)
+        self.bajas_motivo = _EventosOrdenados(codigos_motivo[bajas][con_motivo[bajas]], fecha_baja[con_motivo[bajas]], len(self.motivos), np.flatnonzero(bajas & con_motivo))
+
+    def _celdas(self, df_base):
+        return (df_base['Categoría'].cat.codes.to_numpy(np.int64) + 1) * self._forma[1] + df_base['Línea'].cat.codes.to_numpy(np.int64) + 1
+
+    @instrumentar(nombre='CuboDotacion (comparación con Activos)')
+    def comparar_activos(self, df_base, legajos_activos):
+        # Conteos de la comparación del archivo general contra su pestaña 'Activos', sobre la misma base del cubo
+        celda, n_celdas = self._celdas(df_base), self._forma[0] * self._forma[1]
+        status = df_base['Status ocupación'].to_numpy(dtype=object)
+        es_activo, es_baja = status == 'Activo', status == 'Dado de baja'
+        en_activos = df_base['Nº pers.'].isin(legajos_activos).to_numpy()
+        motivo = df_base['Motivo de la medida']
+        codigos_motivo = motivo.cat.codes.to_numpy(np.int64) if isinstance(motivo.dtype, pd.CategoricalDtype) else pd.Index(self.motivos, dtype=object).get_indexer(motivo)
+
+        conteo = lambda mascara: np.bincount(celda[mascara], minlength=n_celdas)
+        self.activos_general = conteo(es_activo)
+        self.bajas_general = conteo(en_activos & es_baja)
+        self.altas_general = conteo(~en_activos & es_activo)
+        motivos_bajas = codigos_motivo[en_activos & es_baja]
+        self.motivos_general = np.bincount(motivos_bajas[motivos_bajas >= 0], minlength=len(self.motivos))
+        self.motivos_general_orden = _orden_aparicion(motivos_bajas, len(self.motivos))
+        return self
+
+    def _crosstab(self, conteos):
+        return _crosstab_desde_matriz(conteos.reshape(self._forma)[1:, 1:], self.categorias, self.lineas)
+
+    def resumen_altas(self, fecha_inicio, fecha_fin):
+        return self._crosstab(self.altas.contar(*_fechas_ns([fecha_inicio, fecha_fin])))
+
+    def resumen_bajas(self, fecha_inicio, fecha_fin):
+        return self._crosstab(self.bajas.contar(*_fechas_ns([fecha_inicio, fecha_fin])))
+
+    def resumen_activos(self, fecha):
+        return self.indice.activos_a_fecha(fecha)
+
+    def bajas_por_motivo(self, fecha_inicio, fecha_fin):
+        # Mismo resultado que contar_bajas_por_motivo sobre las filas de bajas del período
+        return _tabla_por_motivo(self.motivos, *self.bajas_motivo.contar_y_primeras(*_fechas_ns([fecha_inicio, fecha_fin])))
+
+    def resumen_general(self):
+        # (altas, bajas, activos, bajas por motivo) de la comparación BaseQuery vs. 'Activos' (ver comparar_activos)
+        if self.activos_general is None: raise ValueError("El cubo no tiene la comparación con la pestaña 'Activos'")
+        return self._crosstab(self.altas_general), self._crosstab(self.bajas_general), self._crosstab(self.activos_general), _tabla_por_motivo(self.motivos, self.motivos_general, self.motivos_general_orden)
+
+    def totales(self, fecha_inicio, fecha_fin):
+        # (altas, bajas, dotación activa al cierre) del período, incluidas las filas sin Categoría/Línea reconocida
+        limites = _fechas_ns([fecha_inicio, fecha_fin])
+        return int(self.altas.contar(*limites).sum()), int(self.bajas.contar(*limites).sum()), self.indice.total_a_fecha(fecha_fin)
+
+@instrumentar
+def resumir_periodo(df_base, fecha_inicio, fecha_fin, cubo=None):
+    # Tablas de un reporte por período (semanal, mensual o de lote), en el orden que espera crear_pdf_reporte.
+    # El detalle sale de las filas; los resúmenes, del cubo (se arma uno si no se pasa).
+    cubo = cubo or CuboDotacion(df_base)
+    df_altas_raw, df_bajas_raw = filtrar_novedades_por_fecha(df_base, fecha_inicio, fecha_fin)
+    df_altas, df_bajas = formatear_y_procesar_novedades(df_altas_raw, df_bajas_raw)
+
+    with etapa('resúmenes del cubo'):
+        resumen_activos = cubo.resumen_activos(fecha_fin)
+        resumen_bajas = cubo.resumen_bajas(fecha_inicio, fecha_fin)
+        resumen_altas = cubo.resumen_altas(fecha_inicio, fecha_fin)
+        bajas_motivo = cubo.bajas_por_motivo(fecha_inicio, fecha_fin)
+    return df_altas, df_bajas, bajas_motivo.reset_index(), resumen_altas, resumen_bajas, resumen_activos
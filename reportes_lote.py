@@ -0,0 +1,126 @@
+# Generación de reportes PDF en lote, sin Streamlit.
+# Uso: python reportes_lote.py archivo.xlsx|directorio --anio 2025 [--hoja BaseQuery] [--tipos semanal mensual] [--por-linea] [--salida reportes] [--procesos N]
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+from consolidacion import consolidar_directorio
+from procesamiento import CuboDotacion, crear_pdf_reporte, procesar_archivo_base, resumir_periodo
+
+TITULOS = {'semanal': "Resumen Semanal de Dotación", 'mensual': "Resumen Mensual de Dotación"}
+
+# La base y sus cubos de agregados (general y uno por Línea) se arman una sola vez en el proceso principal y llegan
+# a cada worker en su inicialización (heredados con fork, serializados una vez por worker con spawn), no en cada tarea.
+_DF_BASE = None
+_CUBOS = {}
+
+def _inicializar_worker(df_base, cubos):
+    global _DF_BASE, _CUBOS
+    _DF_BASE, _CUBOS = df_base, cubos
+
+def periodos_del_anio(anio, tipo):
+    if tipo == 'semanal':
+        inicios = pd.date_range(f'{anio}-01-01', f'{anio}-12-31', freq='W-MON')
+        return [(inicio, inicio + pd.Timedelta(days=6)) for inicio in inicios]
+    inicios = pd.date_range(f'{anio}-01-01', periods=12, freq='MS')
+    return [(inicio, inicio + pd.offsets.MonthEnd(0)) for inicio in inicios]
+
+def armar_tareas(anio, tipos, lineas):
+    return [(tipo, inicio, fin, linea) for tipo in tipos for inicio, fin in periodos_del_anio(anio, tipo) for linea in lineas]
+
+def _nombre_archivo(tipo, inicio, linea):
+    nombre = f"Reporte_Semanal_{inicio.strftime('%Y%m%d')}" if tipo == 'semanal' else f"Reporte_Mensual_{inicio.strftime('%Y%m')}"
+    if linea: nombre += '_' + linea.replace(' ', '_')
+    return nombre + '.pdf'
+
+def generar_reporte(tarea, directorio):
+    tipo, inicio, fin, linea = tarea
+    t0 = time.perf_counter()
+    df_base = _DF_BASE if linea is None else _DF_BASE[_DF_BASE['Línea'] == linea]
+    tablas = resumir_periodo(df_base, inicio, fin, _CUBOS[linea])
+    t1 = time.perf_counter()
+
+    titulo = TITULOS[tipo] + (f" - {linea}" if linea else "")
+    pdf_bytes = crear_pdf_reporte(titulo, f"{inicio.strftime('%d/%m/%Y')} - {fin.strftime('%d/%m/%Y')}", *tablas)
+    t2 = time.perf_counter()
+
+    archivo = _nombre_archivo(tipo, inicio, linea)
+    with open(os.path.join(directorio, archivo), 'wb') as f: f.write(pdf_bytes)
+    t3 = time.perf_counter()
+
+    df_altas, df_bajas, _, _, _, resumen_activos = tablas
+    return {
+        'archivo': archivo, 'tipo': tipo, 'linea': linea or 'Todas',
+        'inicio': inicio.strftime('%Y-%m-%d'), 'fin': fin.strftime('%Y-%m-%d'),
+        'altas': len(df_altas), 'bajas': len(df_bajas), 'activos': int(resumen_activos.loc['Total', 'Total']) if not resumen_activos.empty else 0,
+        'bytes': len(pdf_bytes), 'pid': os.getpid(),
+        'tiempos': {'resumen': t1 - t0, 'pdf': t2 - t1, 'escritura': t3 - t2, 'total': t3 - t0},
+    }
+
+def generar_lote(archivo, anio, hoja='BaseQuery', tipos=('semanal', 'mensual'), por_linea=False, directorio='reportes', procesos=None):
+    os.makedirs(directorio, exist_ok=True)
+    inicio_lote = time.perf_counter()
+    archivos, errores_lectura = [], []
+    if os.path.isdir(archivo):
+        # Directorio de exportes históricos: se consolidan en una sola base (ver consolidacion.py)
+        df_base, archivos, errores_lectura = consolidar_directorio(archivo, hojas=tuple(dict.fromkeys([hoja, 'BaseQuery', 'Sheet1'])), procesos=procesos)
+        if df_base is None: raise ValueError(f"No se pudo leer ningún exporte de {archivo}")
+    else:
+        df_base = procesar_archivo_base(archivo, sheet_name=hoja)
+    segundos_lectura = time.perf_counter() - inicio_lote
+
+    lineas = [None] + (list(df_base['Línea'].cat.categories) if por_linea else [])
+    cubos = {linea: CuboDotacion(df_base if linea is None else df_base[df_base['Línea'] == linea]) for linea in lineas}
+    tareas = armar_tareas(anio, tipos, lineas)
+    procesos = procesos or os.cpu_count() or 1
+
+    reportes, errores = [], []
+    if procesos == 1:
+        _inicializar_worker(df_base, cubos)
+        for tarea in tareas:
+            try: reportes.append(generar_reporte(tarea, directorio))
+            except Exception as e: errores.append({'tarea': _describir(tarea), 'error': str(e)})
+    else:
+        with ProcessPoolExecutor(max_workers=procesos, initializer=_inicializar_worker, initargs=(df_base, cubos)) as pool:
+            futuros = {pool.submit(generar_reporte, tarea, directorio): tarea for tarea in tareas}
+            for futuro in as_completed(futuros):
+                try: reportes.append(futuro.result())
+                except Exception as e: errores.append({'tarea': _describir(futuros[futuro]), 'error': str(e)})
+
+    reportes.sort(key=lambda r: (r['tipo'], r['inicio'], r['linea']))
+    manifiesto = {
+        'archivo': os.path.basename(str(archivo)), 'hoja': hoja, 'anio': anio, 'procesos': procesos,
+        'segundos_lectura': segundos_lectura, 'segundos_total': time.perf_counter() - inicio_lote,
+        'exportes': [{**carga, 'corte': carga['corte'].strftime('%Y-%m-%d') if pd.notna(carga['corte']) else None} for carga in archivos],
+        'reportes': reportes, 'errores': [{'tarea': f"lectura de {e['archivo']}", 'error': e['error']} for e in errores_lectura] + errores,
+    }
+    with open(os.path.join(directorio, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump(manifiesto, f, ensure_ascii=False, indent=2)
+    return manifiesto
+
+def _describir(tarea):
+    tipo, inicio, fin, linea = tarea
+    return f"{tipo} {inicio.strftime('%Y-%m-%d')} - {fin.strftime('%Y-%m-%d')} ({linea or 'Todas'})"
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Genera los reportes semanales y mensuales de dotación de un año completo.")
+    parser.add_argument('archivo', help="Archivo Excel con la pestaña de base (BaseQuery o Sheet1), o un directorio de exportes a consolidar")
+    parser.add_argument('--anio', type=int, default=pd.Timestamp.now().year)
+    parser.add_argument('--hoja', default='BaseQuery')
+    parser.add_argument('--tipos', nargs='+', choices=['semanal', 'mensual'], default=['semanal', 'mensual'])
+    parser.add_argument('--por-linea', action='store_true', help="Además del reporte general, genera uno por cada Línea")
+    parser.add_argument('--salida', default='reportes', help="Directorio de salida para los PDF y manifest.json")
+    parser.add_argument('--procesos', type=int, default=None, help="Cantidad de procesos (por defecto, uno por CPU)")
+    args = parser.parse_args(argv)
+
+    manifiesto = generar_lote(args.archivo, args.anio, hoja=args.hoja, tipos=args.tipos, por_linea=args.por_linea, directorio=args.salida, procesos=args.procesos)
+    print(f"{len(manifiesto['reportes'])} reportes generados en {args.salida} ({manifiesto['segundos_total']:.1f} s)")
+    for error in manifiesto['errores']: print(f"Error en {error['tarea']}: {error['error']}", file=sys.stderr)
+    return 1 if manifiesto['errores'] else 0
+
+if __name__ == '__main__':
+    sys.exit(main())